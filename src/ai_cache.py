@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class _PendingCompute:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class AnalysisCache:
+    """
+    Content-addressed cache of AI completions.
+    Keys are a hash of everything that determines the answer (model, system
+    prompt, user prompt). In memory it is an LRU with a TTL; with `disk_dir`
+    set every entry is also written to a JSON file so it survives restarts;
+    expired files are swept at most every `sweep_interval` seconds on put().
+    Concurrent requests for the same key share one upstream call.
+    """
+
+    def __init__(self, max_entries=256, ttl=6 * 3600, disk_dir=None, sweep_interval=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self._entries = OrderedDict()  # key -> (created_at, value)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'collapsed': 0, 'swept': 0}
+
+    @staticmethod
+    def make_key(model, system_prompt, prompt):
+        raw = json.dumps([model, system_prompt, prompt], ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _expired(self, created_at):
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if self._expired(record['created_at']):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return record['created_at'], record['value']
+
+    def _write_disk(self, key, created_at, value):
+        path = self._disk_path(key)
+        tmp_path = path + ".tmp"
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'created_at': created_at, 'value': value}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"AI cache disk write error: {e}")
+
+    def _store(self, key, created_at, value):
+        self._entries[key] = (created_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Returns the cached value or None (memory first, then disk)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and not self._expired(entry[0]):
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+        if self.disk_dir:
+            entry = self._read_disk(key)
+            if entry:
+                with self._lock:
+                    self._store(key, *entry)
+                    self.stats['disk_hits'] += 1
+                return entry[1]
+        return None
+
+    def put(self, key, value):
+        created_at = time.time()
+        with self._lock:
+            self._store(key, created_at, value)
+        if self.disk_dir:
+            self._write_disk(key, created_at, value)
+            if created_at - self._last_sweep >= self.sweep_interval:
+                self._last_sweep = created_at
+                self.sweep_disk()
+
+    def sweep_disk(self):
+        """
+        Deletes disk entries older than the TTL. Prompts contain the date, so
+        most keys are never read again and would otherwise stay forever.
+        The file mtime is the write time.
+        """
+        if self.ttl is None:
+            return 0
+        removed = 0
+        cutoff = time.time() - self.ttl
+        try:
+            names = os.listdir(self.disk_dir)
+        except OSError:
+            return 0
+        for name in names:
+            if not name.endswith((".json", ".tmp")):
+                continue
+            path = os.path.join(self.disk_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass  # removed by another process or a concurrent read
+        with self._lock:
+            self.stats['swept'] += removed
+        return removed
+
+    def claim(self, key):
+        """
+        Registers the caller as the one computing `key`. Returns None to that
+        caller (it must call resolve() when done), or the pending entry of
+        the caller already computing it, to pass to wait().
+        """
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = _PendingCompute()
+                self.stats['misses'] += 1
+                return None
+            self.stats['collapsed'] += 1
+            return pending
+
+    def wait(self, pending):
+        """Result of another caller's claim(); re-raises its exception."""
+        pending.done.wait()
+        if pending.error:
+            raise pending.error
+        return pending.value
+
+    def resolve(self, key, value=None, error=None):
+        """Ends a claim(): caches the value (not on error) and wakes the waiters."""
+        with self._lock:
+            pending = self._pending.pop(key, None)
+        if error is None:
+            self.put(key, value)
+        if pending:
+            pending.value = value
+            pending.error = error
+            pending.done.set()
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value for key, or runs compute() once and caches it.
+        Callers arriving while the same key is being computed wait for that result.
+        Exceptions are passed to every waiter and nothing is cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        pending = self.claim(key)
+        if pending is not None:
+            return self.wait(pending)
+
+        try:
+            value = compute()
+        except Exception as e:
+            self.resolve(key, error=e)
+            raise
+        self.resolve(key, value)
+        return value
@@ -4,13 +4,24 @@ import json
 from datetime import datetime
 from dotenv import load_dotenv
 
+from conversation import ConversationHistory, count_message_tokens
+from tracing import tracer
+
 # Load environment variables
 load_dotenv()
 
+SYSTEM_PROMPT = "Ты эксперт по ставкам на НХЛ. Проанализируй предоставленный матч, используя статистику и текущую форму команд. Дай структурированный прогноз на русском языке, включающий: 1. Ключевые факторы, 2. Анализ рисков, 3. Рекомендуемая ставка (Победитель/Тотал), 4. Уровень уверенности (1-10). Будь краток и профессионален."
+
 class AIEngine:
-    def __init__(self):
+    def __init__(self, cache=None, max_history_tokens=6000):
         self.api_key = os.getenv("DEEPSEEK_API_KEY")
         self.api_url = "https://api.deepseek.com/v1/chat/completions"
+        self.model = "deepseek-chat"
+        # Optional shared AnalysisCache: identical match prompts reuse one completion
+        self.cache = cache
+        # Token budget for the whole request (pinned analysis + recent follow-ups)
+        self.max_history_tokens = max_history_tokens
+        self.last_prompt_tokens = 0
         if not self.api_key:
             print("Warning: DEEPSEEK_API_KEY not found in .env")
 
@@ -24,32 +35,25 @@ class AIEngine:
 
         prompt = self._construct_prompt(match_data)
         
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-        
         # Store history for follow-up questions
-        self.conversation_history = [
-            {"role": "system", "content": "Ты эксперт по ставкам на НХЛ. Проанализируй предоставленный матч, используя статистику и текущую форму команд. Дай структурированный прогноз на русском языке, включающий: 1. Ключевые факторы, 2. Анализ рисков, 3. Рекомендуемая ставка (Победитель/Тотал), 4. Уровень уверенности (1-10). Будь краток и профессионален."},
+        self.conversation_history = self._new_history([
+            {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": prompt}
-        ]
+        ])
+        messages = self.conversation_history.to_messages()
         
-        payload = {
-            "model": "deepseek-chat",
-            "messages": self.conversation_history,
-            "temperature": 0.7
-        }
+        def request_analysis():
+            print(f"Отправка запроса в DeepSeek для матча {match_data.get('home_team')} vs {match_data.get('away_team')}...")
+            return self._complete(messages)
         
         try:
-            print(f"Отправка запроса в DeepSeek для матча {match_data.get('home_team')} vs {match_data.get('away_team')}...")
-            response = requests.post(self.api_url, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
-            
-            result = response.json()
-            analysis = result['choices'][0]['message']['content']
+            if self.cache:
+                key = self.cache.make_key(self.model, SYSTEM_PROMPT, prompt)
+                analysis = self.cache.get_or_compute(key, request_analysis)
+            else:
+                analysis = request_analysis()
             
-            # Save AI response to history
+            # Save AI response to history (each chat continues from its own copy)
             self.conversation_history.append({"role": "assistant", "content": analysis})
             
             return analysis
@@ -57,6 +61,111 @@ class AIEngine:
         except Exception as e:
             return f"Ошибка анализа ИИ: {e}"
 
+    def stream_analysis(self, match_data):
+        """
+        Streaming variant of analyze_match: yields the answer piece by piece
+        as DeepSeek produces it (SSE). A cached analysis is yielded in one piece.
+        On failure the error text is yielded instead, like analyze_match returns it.
+        """
+        if not self.api_key:
+            yield "Error: API Key missing."
+            return
+
+        prompt = self._construct_prompt(match_data)
+        self.conversation_history = self._new_history([
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ])
+        
+        if not self.cache:
+            yield from self._stream_new_analysis(match_data)
+            return
+        
+        key = self.cache.make_key(self.model, SYSTEM_PROMPT, prompt)
+        cached = self.cache.get(key)
+        # Another chat is already streaming this analysis: wait for its result
+        pending = self.cache.claim(key) if cached is None else None
+        if pending is not None:
+            try:
+                cached = self.cache.wait(pending)
+            except Exception as e:
+                yield f"Ошибка анализа ИИ: {e}"
+                return
+        if cached is not None:
+            self.conversation_history.append({"role": "assistant", "content": cached})
+            yield cached
+            return
+        
+        analysis = None
+        error = None
+        try:
+            analysis = yield from self._stream_new_analysis(match_data)
+            if analysis is None:
+                error = RuntimeError("Анализ не получен")
+        except BaseException as e:
+            # Includes the consumer closing the generator early: waiters must not hang
+            error = e if isinstance(e, Exception) else RuntimeError("Анализ прерван")
+            raise
+        finally:
+            self.cache.resolve(key, analysis, error)
+
+    def _stream_new_analysis(self, match_data):
+        """Streams a new analysis into conversation_history; returns it (None on failure)."""
+        parts = []
+        try:
+            print(f"Потоковый запрос в DeepSeek для матча {match_data.get('home_team')} vs {match_data.get('away_team')}...")
+            for chunk in self._stream(self.conversation_history.to_messages()):
+                parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            yield f"\n\nОшибка анализа ИИ: {e}"
+            return None
+        
+        analysis = "".join(parts)
+        self.conversation_history.append({"role": "assistant", "content": analysis})
+        return analysis
+
+    def stream_followup(self, question):
+        """Streaming variant of ask_followup."""
+        if not hasattr(self, 'conversation_history') or not self.conversation_history:
+            yield "Сначала выполните анализ матча."
+            return
+        
+        self.conversation_history.append({"role": "user", "content": question})
+        
+        parts = []
+        try:
+            for chunk in self._stream(self.conversation_history.to_messages()):
+                parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            yield f"\n\nОшибка при ответе: {e}"
+            return
+        self.conversation_history.append({"role": "assistant", "content": "".join(parts)})
+
+    def load_analysis(self, match_data, analysis):
+        """
+        Starts a conversation from an analysis computed elsewhere (e.g. pre-warmed),
+        so follow-up questions work exactly as after analyze_match.
+        """
+        self.conversation_history = self._new_history([
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": self._construct_prompt(match_data)},
+            {"role": "assistant", "content": analysis}
+        ])
+
+    def export_history(self):
+        """JSON-serialisable conversation state (for spilling idle sessions to disk)."""
+        return self.conversation_history.to_dict()
+
+    def restore_history(self, state):
+        self.conversation_history = ConversationHistory.from_dict(state, max_tokens=self.max_history_tokens)
+
+    def has_analysis(self):
+        """True if the last analyze_match call produced an AI answer (not an error string)."""
+        history = getattr(self, 'conversation_history', None)
+        return bool(history) and history[-1]["role"] == "assistant"
+
     def ask_followup(self, question):
         """Sends a follow-up question in the same context."""
         if not hasattr(self, 'conversation_history') or not self.conversation_history:
@@ -64,26 +173,80 @@ class AIEngine:
             
         self.conversation_history.append({"role": "user", "content": question})
         
+        try:
+            answer = self._complete(self.conversation_history.to_messages())
+            self.conversation_history.append({"role": "assistant", "content": answer})
+            return answer
+        except Exception as e:
+            return f"Ошибка при ответе: {e}"
+
+    def _new_history(self, messages):
+        return ConversationHistory(messages, max_tokens=self.max_history_tokens)
+
+    def _report_prompt_size(self, messages):
+        self.last_prompt_tokens = count_message_tokens(messages)
+        print(f"DeepSeek prompt: {len(messages)} messages, ~{self.last_prompt_tokens} tokens")
+
+    def _complete(self, messages):
+        """Sends one chat completion request and returns the answer text (raises on failure)."""
+        self._report_prompt_size(messages)
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}"
         }
         
         payload = {
-            "model": "deepseek-chat",
-            "messages": self.conversation_history,
+            "model": self.model,
+            "messages": messages,
             "temperature": 0.7
         }
         
-        try:
+        with tracer.span("deepseek"):
             response = requests.post(self.api_url, headers=headers, json=payload, timeout=30)
             response.raise_for_status()
             result = response.json()
-            answer = result['choices'][0]['message']['content']
-            self.conversation_history.append({"role": "assistant", "content": answer})
-            return answer
+        return result['choices'][0]['message']['content']
+
+    def _stream(self, messages):
+        """Sends a streaming (SSE) chat completion request and yields content deltas."""
+        self._report_prompt_size(messages)
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": 0.7,
+            "stream": True
+        }
+        
+        # Whole answer and time to the first token
+        stream_span = tracer.start("deepseek_stream")
+        first_token = tracer.start("deepseek_first_token")
+        try:
+            # timeout=(connect, read): read applies between chunks, not to the whole answer
+            with requests.post(self.api_url, headers=headers, json=payload, timeout=(10, 30), stream=True) as response:
+                response.raise_for_status()
+                response.encoding = 'utf-8'  # SSE is always UTF-8, even without a charset header
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue  # keep-alive comments / blank separators
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    event = json.loads(data)
+                    choices = event.get('choices') or [{}]
+                    delta = choices[0].get('delta', {}).get('content')
+                    if delta:
+                        first_token.finish()
+                        yield delta
         except Exception as e:
-            return f"Ошибка при ответе: {e}"
+            stream_span.finish(type(e).__name__)
+            raise
+        finally:
+            stream_span.finish()
 
     def _construct_prompt(self, data):
         """Formats the match data into a readable text prompt."""
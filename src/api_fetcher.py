@@ -1,11 +1,142 @@
 from nhlpy import NHLClient
+from nhlpy.http_client import HttpClient
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import contextvars
+import threading
 import time
+import httpx
 
-class NHLAPIFetcher:
+from tracing import traced, tracer
+
+
+class _InFlightCall:
+    """A request currently on the wire; identical requests wait on it instead of repeating it."""
     def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class PooledHttpClient(HttpClient):
+    """
+    Drop-in replacement for nhlpy's HttpClient (which opens a new httpx.Client per request).
+    Keeps one keep-alive connection pool, caps in-flight requests to the NHL API
+    and collapses identical concurrent GETs into a single upstream call.
+    """
+    def __init__(self, config, max_connections=10, max_in_flight=6):
+        super().__init__(config)
+        self._http = httpx.Client(
+            verify=config.ssl_verify,
+            timeout=config.timeout,
+            follow_redirects=config.follow_redirects,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self.metrics = {
+            'requests': 0,          # upstream HTTP requests sent
+            'collapsed': 0,         # callers served by an identical in-flight request
+            'pool_hits': 0,         # requests that reused a keep-alive connection
+            'new_connections': 0,   # requests that had to open a TCP connection
+            'errors': 0,
+            'wait_time_total': 0.0, # time spent waiting for an in-flight slot
+            'wait_time_max': 0.0
+        }
+
+    def _count(self, **deltas):
+        with self._metrics_lock:
+            for key, value in deltas.items():
+                self.metrics[key] += value
+
+    def get(self, endpoint, resource, query_params=None):
+        key = (endpoint.value, resource, tuple(sorted((query_params or {}).items())))
+        with self._inflight_lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InFlightCall()
+        
+        if not leader:
+            self._count(collapsed=1)
+            call.done.wait()
+            if call.error:
+                raise call.error
+            return call.response
+        
+        try:
+            wait_start = time.monotonic()
+            with self._slots:
+                waited = time.monotonic() - wait_start
+                with self._metrics_lock:
+                    self.metrics['wait_time_total'] += waited
+                    self.metrics['wait_time_max'] = max(self.metrics['wait_time_max'], waited)
+                
+                # httpcore reports a TCP connect only when the pool had no idle connection
+                connected = []
+                def trace(event_name, info):
+                    if event_name == "connection.connect_tcp.started":
+                        connected.append(True)
+                
+                full_url = f"{endpoint.value}{resource}"
+                if self._config.debug:
+                    self._logger.debug(f"GET: {full_url}")
+                r = self._http.get(url=full_url, params=query_params, extensions={"trace": trace})
+                if connected:
+                    self._count(requests=1, new_connections=1)
+                else:
+                    self._count(requests=1, pool_hits=1)
+            
+            self._handle_response(r, resource)
+            call.response = r
+            return r
+        except Exception as e:
+            self._count(errors=1)
+            call.error = e
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    def get_metrics(self):
+        with self._metrics_lock:
+            m = dict(self.metrics)
+        m['reuse_ratio'] = m['pool_hits'] / m['requests'] if m['requests'] else 0.0
+        m['wait_time_avg'] = m['wait_time_total'] / m['requests'] if m['requests'] else 0.0
+        return m
+
+    def close(self):
+        self._http.close()
+
+
+class NHLAPIFetcher:
+    """
+    NHL API access. Meant to be created once per process and shared:
+    the HTTP pool, request collapsing and standings snapshot all live here.
+    """
+    def __init__(self, standings_ttl=600, max_connections=10, max_in_flight=6, detail_timeout=8):
         self.client = NHLClient()
+        
+        # Worker pool for concurrent detail gathering (boxscore + matchup + standings)
+        self.detail_timeout = detail_timeout
+        self._detail_pool = ThreadPoolExecutor(max_workers=max_in_flight * 2, thread_name_prefix="nhl-details")
+        
+        # Swap nhlpy's per-request httpx.Client for one pooled client shared by every endpoint
+        self.http = PooledHttpClient(self.client._config, max_connections=max_connections, max_in_flight=max_in_flight)
+        self.client._http_client = self.http
+        for api in vars(self.client).values():
+            if isinstance(getattr(api, 'client', None), HttpClient):
+                api.client = self.http
+        
+        # Standings snapshot shared by every analysis (see get_standings_snapshot)
+        self.standings_ttl = standings_ttl
+        self._standings_snapshot = None
+        self._standings_lock = threading.Lock()
 
+    @traced("get_games_for_date")
     def get_games_for_date(self, date_str=None):
         """
         Fetches games for a specific date (YYYY-MM-DD).
@@ -41,11 +172,19 @@ class NHLAPIFetcher:
             print(f"Error fetching schedule: {e}")
             return []
 
-    def get_game_details(self, game_id):
+    @traced("get_game_details")
+    def get_game_details(self, game_id, include_standings=False, parallel=True, timeout=None):
         """
         Fetches detailed boxscore/stats for a game. 
         For future games, boxscore is empty, so we need 'match_up' and 'standings'.
+        
+        With parallel=True boxscore, matchup (and standings snapshot if include_standings)
+        are requested together, each bounded by `timeout` seconds. A failed or slow
+        call is left out and reported in data['errors']; None only if everything failed.
         """
+        if parallel:
+            return self._get_game_details_parallel(game_id, include_standings, timeout or self.detail_timeout)
+        
         data = {}
         try:
             # 1. Boxscore (good for live/finished)
@@ -65,12 +204,89 @@ class NHLAPIFetcher:
             return None
         return data
 
+    def _get_game_details_parallel(self, game_id, include_standings, timeout):
+        calls = {
+            'boxscore': lambda: self.client.game_center.boxscore(game_id=game_id),
+            'matchup': lambda: self.client.game_center.match_up(game_id=str(game_id))
+        }
+        if include_standings:
+            calls['standings'] = self.get_standings_snapshot
+        
+        futures = {key: self._detail_pool.submit(contextvars.copy_context().run, call) for key, call in calls.items()}
+        
+        data = {}
+        errors = {}
+        deadline = time.monotonic() + timeout
+        for key, future in futures.items():
+            try:
+                # Calls run concurrently, so each only gets what is left of the shared window
+                data[key] = future.result(timeout=max(deadline - time.monotonic(), 0))
+            except TimeoutError:
+                errors[key] = f"timeout after {timeout}s"
+            except Exception as e:
+                errors[key] = str(e)
+        
+        if 'standings' in data and data['standings'].get('standings') is None:
+            # An empty snapshot must not look like real standings to the prompt builder
+            del data['standings']
+            errors['standings'] = "standings unavailable"
+        
+        if errors:
+            print(f"Partial game details for {game_id}: {errors}")
+            data['errors'] = errors
+        if not any(key in data for key in calls):
+            return None
+        return data
+
     def get_standings(self):
         """Fetches current standings to get team form/stats."""
+        with tracer.span("get_standings"):
+            try:
+                return self.client.standings.league_standings()
+            except:
+                return None
+
+    def get_http_metrics(self):
+        """Pool hits, connection reuse, collapsed requests and slot wait time."""
+        return self.http.get_metrics()
+
+    def get_standings_snapshot(self):
+        """
+        Returns the cached standings snapshot: {'standings': raw, 'by_abbrev': {abbrev: team}, 'fetched_at': ts}.
+        Refetched at most once per `standings_ttl`; while one thread refreshes,
+        other readers keep getting the previous snapshot instead of waiting.
+        """
+        snapshot = self._standings_snapshot
+        if snapshot and time.monotonic() - snapshot['fetched_at'] < self.standings_ttl:
+            return snapshot
+        
+        # Someone else is already refreshing: serve the stale copy if we have one
+        if not self._standings_lock.acquire(blocking=snapshot is None):
+            return snapshot
         try:
-            return self.client.standings.league_standings()
-        except:
-            return None
+            snapshot = self._standings_snapshot
+            if snapshot and time.monotonic() - snapshot['fetched_at'] < self.standings_ttl:
+                return snapshot
+            
+            std = self.get_standings()
+            if std and 'standings' in std:
+                by_abbrev = {}
+                for team in std['standings']:
+                    # Structure: team['teamAbbrev']['default']
+                    raw_abb = team.get('teamAbbrev', {})
+                    abb = raw_abb.get('default', str(raw_abb)) if isinstance(raw_abb, dict) else str(raw_abb)
+                    by_abbrev[abb] = team
+                snapshot = {'standings': std, 'by_abbrev': by_abbrev, 'fetched_at': time.monotonic()}
+            elif snapshot:
+                # Fetch failed: keep the last good snapshot until the next window
+                snapshot = dict(snapshot, fetched_at=time.monotonic())
+            else:
+                return {'standings': None, 'by_abbrev': {}, 'fetched_at': 0}
+            
+            self._standings_snapshot = snapshot
+            return snapshot
+        finally:
+            self._standings_lock.release()
 
 if __name__ == "__main__":
     # Test
@@ -85,3 +301,4 @@ if __name__ == "__main__":
         details = fetcher.get_game_details(g_id)
         if details:
             print("  - details fetched successfully")
+    print(f"HTTP metrics: {fetcher.get_http_metrics()}")
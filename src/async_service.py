@@ -0,0 +1,83 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from main import simplify_game_data
+
+
+class AsyncAnalysisService:
+    """
+    Awaitable facade over the blocking NHLAPIFetcher / AIEngine calls.
+    Every call runs on a bounded thread pool, so a slow DeepSeek request
+    never blocks the bot's event loop for other chats.
+    """
+
+    def __init__(self, io_workers=8, ai_workers=4):
+        # Separate pools: long AI calls must not starve quick NHL API lookups
+        self.io_executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="nhl-io")
+        self.ai_executor = ThreadPoolExecutor(max_workers=ai_workers, thread_name_prefix="deepseek")
+
+    async def _run(self, executor, func, *args):
+        loop = asyncio.get_running_loop()
+        # The pool thread sees the caller's context (trace tags: game_id, chat)
+        return await loop.run_in_executor(executor, contextvars.copy_context().run, func, *args)
+
+    async def get_scheduled_games(self, schedule_cache, date_str=None):
+        """Reads the shared ScheduleCache; only a cold cache touches the NHL API."""
+        return await self._run(self.io_executor, schedule_cache.get_games, date_str)
+
+    async def get_scheduled_game(self, schedule_cache, game_id):
+        return await self._run(self.io_executor, schedule_cache.get_game, game_id)
+
+    async def get_game_details(self, fetcher, game_id, include_standings=True):
+        """Boxscore, matchup and standings gathered concurrently in one round trip."""
+        return await self._run(self.io_executor, partial(fetcher.get_game_details, game_id, include_standings=include_standings))
+
+    async def build_payload(self, game_info, details, fetcher):
+        """Runs simplify_game_data (it fetches standings) off the event loop."""
+        return await self._run(self.io_executor, simplify_game_data, game_info, details or {}, fetcher)
+
+    async def stream(self, generator_func, *args):
+        """
+        Runs a blocking generator (e.g. AIEngine.stream_analysis) on the AI pool
+        and re-yields its items on the event loop as they arrive. If the consumer
+        stops early (error, cancel, aclose) the generator is closed after its
+        current item instead of running to the end on the pool.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        done = object()
+        stop = threading.Event()
+
+        def produce():
+            gen = generator_func(*args)
+            try:
+                for item in gen:
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, item)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                gen.close()
+                if not stop.is_set():
+                    loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        producer = loop.run_in_executor(self.ai_executor, contextvars.copy_context().run, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+            await producer
+        finally:
+            stop.set()
+
+    def shutdown(self):
+        self.io_executor.shutdown(wait=False, cancel_futures=True)
+        self.ai_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,289 @@
+"""
+Resumable backfill of historical matches.
+
+    python backfill.py --season 2023-2024 --workers 3
+    python backfill.py --since 2024-01-01 --until 2024-01-31
+    python backfill.py --status
+
+The match list of the range is written to a durable work queue
+(data/backfill.db) once; after a crash or kill the same command resumes
+from the queue instead of starting over.
+"""
+import argparse
+import json
+import os
+import queue
+import signal
+import sqlite3
+import sys
+import threading
+import time
+
+from collector import new_limiter, new_parser, open_storage, start_workers
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    match       TEXT,              -- JSON of the results-list row
+    state       TEXT NOT NULL,     -- pending | in_progress | done | failed
+    attempts    INTEGER NOT NULL DEFAULT 0,  -- failed attempts
+    last_error  TEXT,
+    updated_at  REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+STATES = ('pending', 'in_progress', 'done', 'failed')
+
+
+class BackfillQueue:
+    """
+    Durable work queue in SQLite. Items are claimed as in_progress; on start
+    recover() puts items a killed run left in_progress back to pending.
+    Attempts are counted by fail(), so a kill costs nothing for the matches
+    that were never fetched. A failed item is retried until it has failed
+    max_attempts times, then it stays failed.
+    """
+
+    def __init__(self, filepath="data/backfill.db", max_attempts=3):
+        self.filepath = filepath
+        self.max_attempts = max_attempts
+        directory = os.path.dirname(filepath)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(filepath, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.executescript(QUEUE_SCHEMA)
+
+    def add(self, matches):
+        """Enqueues matches as pending; ids already in the queue keep their state."""
+        now = time.time()
+        rows = [(m['id'], json.dumps(m, ensure_ascii=False), now) for m in matches if m.get('id')]
+        with self._lock, self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO jobs (id, match, state, updated_at) VALUES (?, ?, 'pending', ?)", rows)
+            return self.conn.total_changes - before
+
+    def recover(self):
+        """Puts items left in_progress by a killed run back to pending."""
+        with self._lock, self.conn:
+            return self.conn.execute(
+                "UPDATE jobs SET state = 'pending', updated_at = ? WHERE state = 'in_progress'", (time.time(),)
+            ).rowcount
+
+    def claim_all(self):
+        """Marks every pending item in_progress and returns their matches."""
+        with self._lock, self.conn:
+            rows = self.conn.execute("SELECT id, match FROM jobs WHERE state = 'pending' ORDER BY rowid").fetchall()
+            self.conn.execute(
+                "UPDATE jobs SET state = 'in_progress', updated_at = ? WHERE state = 'pending'", (time.time(),))
+        return [json.loads(match) for _, match in rows]
+
+    def done(self, match_ids):
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "UPDATE jobs SET state = 'done', last_error = NULL, updated_at = ? WHERE id = ?",
+                [(time.time(), match_id) for match_id in match_ids])
+
+    def fail(self, match_id, error):
+        """Counts a failed attempt; the item goes back to pending while it has attempts left."""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET attempts = attempts + 1, "
+                "state = CASE WHEN attempts + 1 < ? THEN 'pending' ELSE 'failed' END, "
+                "last_error = ?, updated_at = ? WHERE id = ?",
+                (self.max_attempts, (error or "")[:500], time.time(), match_id))
+
+    def counts(self):
+        with self._lock:
+            rows = dict(self.conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+        return {state: rows.get(state, 0) for state in STATES}
+
+    def failures(self, limit=20):
+        with self._lock:
+            return self.conn.execute(
+                "SELECT id, attempts, last_error FROM jobs WHERE state = 'failed' ORDER BY updated_at DESC LIMIT ?",
+                (limit,)).fetchall()
+
+    def get_meta(self, key):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def season_range(season):
+    """'2023-2024' -> ('2023-09-01', '2024-06-30')."""
+    first, second = season.split("-")
+    return f"{int(first)}-09-01", f"{int(second)}-06-30"
+
+
+class Progress:
+    """Throughput and ETA for the items finished in this process."""
+
+    def __init__(self, total, every=10):
+        self.total = total
+        self.every = every
+        self.saved = 0
+        self.errors = 0
+        self.started = time.monotonic()
+
+    def step(self, ok):
+        if ok:
+            self.saved += 1
+        else:
+            self.errors += 1
+        finished = self.saved + self.errors
+        if finished % self.every:
+            return
+        elapsed = time.monotonic() - self.started
+        rate = self.saved / elapsed if elapsed else 0
+        # Retries of failed matches come on top; the estimate counts each queued match once
+        remaining = max(self.total - self.saved, 0)
+        eta = f"{remaining / rate / 60:.0f} min" if rate else "?"
+        print(f"Progress: saved {self.saved}/{self.total}, errors {self.errors} | "
+              f"{rate * 60:.1f} matches/min, ETA {eta}")
+
+
+def enqueue_range(work, parser, storage, since, until, rescan=False):
+    """
+    Lists the range once (remembered in the queue) and enqueues matches not
+    in storage. A listing that fails or finds nothing is not remembered, so
+    the next run lists the range again.
+    """
+    job_key = f"listed:{since}:{until}"
+    if work.get_meta(job_key) and not rescan:
+        print(f"Resuming {since} .. {until} from the queue")
+        return
+    print(f"\n--- Listing finished matches {since} .. {until} ---")
+    rows = [m for m in parser.get_finished_matches(since=since, until=until, strict=True) if m.get('url')]
+    if not rows:
+        print(f"No matches listed for {since} .. {until}; the range stays unlisted")
+        return
+    new = [m for m in rows if not storage.match_exists(m['id'])]
+    added = work.add(new)
+    work.set_meta(job_key, str(time.time()))
+    print(f"Listed {len(rows)} matches, {added} queued ({len(rows) - len(new)} already stored)")
+
+
+def run_backfill(since, until, workers=1, rate=0.5, source="browser", queue_path="data/backfill.db",
+                 max_attempts=3, rescan=False, base_url=None, max_rate=None):
+    print("=== NHL Backfill ===")
+    storage = open_storage()
+    work = BackfillQueue(queue_path, max_attempts=max_attempts)
+    limiter = new_limiter(rate, max_rate, burst=workers)
+    parser = new_parser(source, limiter)
+    if base_url:
+        parser.set_base_url(base_url)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(1))
+
+    recovered = work.recover()
+    if recovered:
+        print(f"Recovered {recovered} interrupted matches")
+    try:
+        with storage:
+            enqueue_range(work, parser, storage, since, until, rescan)
+            counts = work.counts()
+            progress = Progress(counts['pending'])
+            print(f"Queue: {counts}")
+
+            # Rounds: failures with attempts left go back to pending for the next round
+            while True:
+                batch = work.claim_all()
+                if not batch:
+                    break
+                print(f"\n--- Fetching details for {len(batch)} matches ({workers} workers) ---")
+                _run_round(batch, parser, storage, work, workers, progress)
+    finally:
+        parser.close_driver()
+        counts = work.counts()
+        print(f"\nQueue: {counts}")
+        for match_id, attempts, error in work.failures():
+            print(f"  failed {match_id} after {attempts} attempts: {error}")
+        work.close()
+        print(f"Rate limiter: {limiter.summary()}")
+
+
+def _run_round(batch, parser, storage, work, workers, progress, ack_every=20):
+    jobs = queue.Queue()
+    results = queue.Queue()
+    unacked = []  # saved to storage, not yet durable -> still in_progress in the queue
+    for match in batch:
+        if storage.match_exists(match['id']):
+            unacked.append(match['id'])  # stored before a crash, only the ack was lost
+        else:
+            jobs.put(match)
+    running = len(start_workers(parser, min(workers, jobs.qsize()), jobs, results)) if jobs.qsize() else 0
+    try:
+        while running:
+            name, match, full_data, error = results.get()
+            if match is None:
+                running -= 1
+                continue
+            if full_data is None:
+                work.fail(match['id'], error)
+            else:
+                storage.add_match(full_data)
+                unacked.append(match['id'])
+                # Ack only what the storage has made durable
+                if len(unacked) >= ack_every:
+                    storage.save_data()
+                    work.done(unacked)
+                    unacked = []
+            progress.step(full_data is not None)
+    finally:
+        if unacked:
+            storage.save_data()
+            work.done(unacked)
+
+
+def show_status(queue_path):
+    work = BackfillQueue(queue_path)
+    print(f"Queue {queue_path}: {work.counts()}")
+    for match_id, attempts, error in work.failures():
+        print(f"  failed {match_id} after {attempts} attempts: {error}")
+    work.close()
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Resumable backfill of finished NHL matches")
+    cli.add_argument("--season", help="e.g. 2023-2024 (archive results page, Sep 1 - Jun 30)")
+    cli.add_argument("--since", metavar="YYYY-MM-DD")
+    cli.add_argument("--until", metavar="YYYY-MM-DD", default=time.strftime("%Y-%m-%d"))
+    cli.add_argument("--workers", type=int, default=1)
+    cli.add_argument("--rate", type=float, default=0.5, help="starting requests per second across all workers")
+    cli.add_argument("--max-rate", type=float, help="ceiling the rate climbs to while healthy (default 2 x --rate)")
+    cli.add_argument("--source", choices=("browser", "feed"), default="browser")
+    cli.add_argument("--queue", default="data/backfill.db")
+    cli.add_argument("--max-attempts", type=int, default=3)
+    cli.add_argument("--rescan", action="store_true", help="list the range again and queue matches found since")
+    cli.add_argument("--status", action="store_true", help="print the queue state and exit")
+    args = cli.parse_args()
+
+    if args.status:
+        show_status(args.queue)
+    elif args.season:
+        since, until = season_range(args.season)
+        run_backfill(since, until, workers=max(1, args.workers), rate=args.rate, source=args.source,
+                     queue_path=args.queue, max_attempts=args.max_attempts, rescan=args.rescan,
+                     max_rate=args.max_rate,
+                     base_url=f"https://www.flashscorekz.com/hockey/usa/nhl-{args.season}/")
+    elif args.since:
+        run_backfill(args.since, args.until, workers=max(1, args.workers), rate=args.rate, source=args.source,
+                     queue_path=args.queue, max_attempts=args.max_attempts, rescan=args.rescan,
+                     max_rate=args.max_rate)
+    else:
+        cli.error("--season or --since is required")
@@ -0,0 +1,77 @@
+"""
+Page load time and bytes transferred with and without resource blocking.
+
+    python bench_browser.py                  # results page + first match, 3 runs
+    python bench_browser.py 5 /match/...     # custom run count / match URL
+
+For each profile a fresh browser loads the NHL results page and a match
+page (#/h2h) and waits for the rows the parser reads. Bytes are the sum of
+encodedDataLength over the CDP Network.loadingFinished events in Chrome's
+performance log: every response that came over the wire, cross-origin ones
+included (Resource Timing reports 0 for those without Timing-Allow-Origin).
+Requests blocked by the profile never finish and count as nothing.
+"""
+import json
+import statistics
+import sys
+import time
+
+from data_fetcher import FlashscoreParser
+
+PROFILES = (("full", False), ("blocked", True))
+
+
+def finished_requests(driver):
+    """(responses, bytes) from the performance log entries since the last call."""
+    requests = transferred = 0
+    for entry in driver.get_log('performance'):
+        message = json.loads(entry['message'])['message']
+        if message.get('method') == 'Network.loadingFinished':
+            requests += 1
+            transferred += message['params'].get('encodedDataLength', 0)
+    return requests, transferred
+
+
+def measure(parser, url, wait_name, selector):
+    finished_requests(parser.driver)  # drop what the restart logged
+    start = time.perf_counter()
+    parser._load_page(url)
+    parser._wait_for(wait_name, selector)
+    elapsed = time.perf_counter() - start
+    requests, transferred = finished_requests(parser.driver)
+    return elapsed, requests, transferred
+
+
+def run(runs, match_url):
+    print(f"{'page':>8} {'profile':>8} {'load s':>8} {'requests':>9} {'KB':>9}")
+    for page in ("results", "match"):
+        for profile, block in PROFILES:
+            parser = FlashscoreParser(headless=True, block_resources=block)
+            # CDP network events go to the performance log that measure() reads
+            parser.options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+            try:
+                if page == "results":
+                    url, wait = parser.base_url + "results/", ('match_list', ".event__match")
+                else:
+                    if not match_url:
+                        links = parser.get_finished_matches()
+                        match_url = links[0]['url'] if links else None
+                    if not match_url:
+                        print("No match URL found")
+                        return
+                    url = match_url if match_url.startswith("http") else "https://www.flashscorekz.com" + match_url
+                    url, wait = url.split('?')[0].rstrip('/') + "#/h2h", ('h2h', ".h2h__row")
+                samples = []
+                for _ in range(runs):
+                    parser.driver = parser.browser.restart()  # cold HTTP cache; startup not timed
+                    samples.append(measure(parser, url, *wait))
+                load = statistics.median(s[0] for s in samples)
+                requests = statistics.median(s[1] for s in samples)
+                kb = statistics.median(s[2] for s in samples) / 1024
+                print(f"{page:>8} {profile:>8} {load:>8.2f} {requests:>9.0f} {kb:>9.0f}")
+            finally:
+                parser.close_driver()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 3, sys.argv[2] if len(sys.argv) > 2 else None)
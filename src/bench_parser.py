@@ -0,0 +1,55 @@
+"""
+Results-page parsing speed per backend, on the saved page in fixtures/flashscore.
+
+    python bench_parser.py              # page as saved, and scaled to a full season
+    python bench_parser.py 40 1300      # custom row counts
+
+Rows of the saved page are repeated to reach each size, so the page
+structure stays the same while the row count grows.
+"""
+import os
+import re
+import sys
+import time
+
+from results_parser import BACKENDS
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "flashscore", "results_page.html")
+_ROW = re.compile(r'<div id="g_4_[^"]*"[^>]*class="event__match.*?</div>\n', re.S)
+
+
+def scaled_page(page, rows):
+    """The saved page with its match rows repeated/trimmed to `rows` rows."""
+    found = _ROW.findall(page)
+    start = page.index(found[0])
+    end = page.index(found[-1]) + len(found[-1])
+    body = "".join(found[i % len(found)] for i in range(rows))
+    return page[:start] + body + page[end:]
+
+
+def best_of(func, arg, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(arg)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(sizes):
+    with open(FIXTURE, encoding='utf-8') as f:
+        page = f.read()
+    print(f"{'rows':>6} {'backend':>8} {'ms':>9} {'found':>6} {'vs bs4':>7}")
+    for rows in sizes:
+        html = scaled_page(page, rows)
+        repeat = 5 if rows <= 200 else 3
+        baseline, _ = best_of(BACKENDS['bs4'], html, repeat)
+        for name, func in BACKENDS.items():
+            elapsed, matches = (baseline, None) if name == 'bs4' else best_of(func, html, repeat)
+            found = len(matches) if matches is not None else len(BACKENDS['bs4'](html))
+            print(f"{rows:>6} {name:>8} {elapsed * 1000:>9.1f} {found:>6} {baseline / elapsed:>6.1f}x")
+
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or [40, 1300])
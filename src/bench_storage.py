@@ -0,0 +1,108 @@
+"""
+Startup time and memory of the match database at different sizes.
+
+    python bench_storage.py              # 1k, 10k, 100k matches
+    python bench_storage.py 1000 5000    # custom sizes
+
+Each measurement runs in a fresh subprocess so RSS numbers are not polluted
+by earlier runs. Modes:
+  legacy     - json.load of the old single-file database
+  eager      - StorageJson(lazy=False): full log scan at startup
+  lazy-cold  - StorageJson(lazy=True) without a sidecar index (builds it)
+  lazy-warm  - StorageJson(lazy=True) with the sidecar index
+"""
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+MODES = ("legacy", "eager", "lazy-cold", "lazy-warm")
+
+
+def fake_match(i):
+    teams = ["Boston Bruins", "New York Rangers", "Toronto Maple Leafs", "Colorado Avalanche", "Dallas Stars"]
+    home, away = random.sample(teams, 2)
+    return {
+        'id': f"g_4_{i:08d}",
+        'home': home,
+        'away': away,
+        'home_score': str(random.randint(0, 6)),
+        'away_score': str(random.randint(0, 6)),
+        'url': f"/match/hockey/{i}/",
+        'start_time': "12.10.2024 02:00",
+        'h2h': {'home_last5': [f"{home} 3:2 {away} 01.01.24"] * 5, 'away_last5': [], 'head_to_head': [], 'all_matches': []},
+        'stats': {'shots_on_goal': {'home': '30', 'away': '25'}, 'raw': {f"stat {k}": {'home': '1', 'away': '2'} for k in range(12)}},
+        'player_stats': {'skaters': [{'name': f"Player {k}", 'team': home, 'goals': '0', 'toi': '15:00'} for k in range(10)], 'goalies': []}
+    }
+
+
+def build_dataset(directory, size):
+    from storage_json import StorageJson
+
+    matches = {m['id']: m for m in (fake_match(i) for i in range(size))}
+    legacy_path = os.path.join(directory, "nhl_data.json")
+    with open(legacy_path, 'w', encoding='utf-8') as f:
+        json.dump({"matches": matches}, f, ensure_ascii=False)
+    # Migration writes the JSONL log next to the legacy file
+    StorageJson(filepath=legacy_path).close()
+    return legacy_path
+
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def measure(mode, legacy_path):
+    """Runs inside the subprocess: open the database once, print JSON results."""
+    from storage_json import StorageJson
+
+    index_path = os.path.splitext(legacy_path)[0] + ".jsonl.idx"
+    if mode == "lazy-cold" and os.path.exists(index_path):
+        os.remove(index_path)
+
+    before = rss_kb()
+    start = time.perf_counter()
+    if mode == "legacy":
+        with open(legacy_path, 'r', encoding='utf-8') as f:
+            db = json.load(f)
+        count = len(db["matches"])
+        exists = "g_4_00000001" in db["matches"]
+    else:
+        storage = StorageJson(filepath=legacy_path, lazy=mode.startswith("lazy"))
+        count = len(storage.index)
+        exists = storage.match_exists("g_4_00000001")
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'seconds': elapsed, 'rss_mb': (rss_kb() - before) / 1024, 'count': count, 'exists': exists}))
+
+
+def run(sizes):
+    print(f"{'matches':>8} {'mode':>10} {'startup s':>10} {'RSS +MB':>9}")
+    for size in sizes:
+        directory = tempfile.mkdtemp(prefix="bench_storage_")
+        try:
+            legacy_path = build_dataset(directory, size)
+            for mode in MODES:
+                out = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--measure", mode, legacy_path],
+                    cwd=SRC_DIR, capture_output=True, text=True, check=True
+                ).stdout.strip().splitlines()[-1]
+                result = json.loads(out)
+                print(f"{size:>8} {mode:>10} {result['seconds']:>10.3f} {result['rss_mb']:>9.1f}")
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--measure":
+        measure(sys.argv[2], sys.argv[3])
+    else:
+        run([int(a) for a in sys.argv[1:]] or [1000, 10000, 100000])
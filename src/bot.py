@@ -8,7 +8,13 @@ from telegram.ext import ApplicationBuilder, ContextTypes, CommandHandler, Callb
 
 from api_fetcher import NHLAPIFetcher
 from ai_engine import AIEngine
-from main import simplify_game_data
+from ai_cache import AnalysisCache
+from async_service import AsyncAnalysisService
+from schedule_cache import ScheduleCache
+from prewarm import AnalysisPrewarmer
+from tg_stream import StreamingMessage
+from sessions import SessionStore
+from tracing import tags, tracer
 
 # Logging setup
 logging.basicConfig(
@@ -19,13 +25,37 @@ logging.basicConfig(
 load_dotenv()
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 
-# Global state: {chat_id: {'engine': AIEngine(), 'current_game': dict}}
-user_sessions = {}
+# All blocking NHL API / DeepSeek calls go through this pool, never the event loop
+service = AsyncAnalysisService()
+
+# One fetcher (pooled HTTP, collapsed requests, standings snapshot) for the whole process
+fetcher = NHLAPIFetcher()
+
+# Completions keyed by model + prompts; persisted so restarts don't re-pay DeepSeek
+analysis_cache = AnalysisCache(max_entries=256, ttl=6 * 3600, disk_dir="data/ai_cache")
+
+def new_engine():
+    return AIEngine(cache=analysis_cache)
+
+# Daily schedule shared by all chats, refreshed in the background
+schedule_cache = ScheduleCache(fetcher, ttl=300)
+
+# Baseline analyses of today's games, computed ahead of the clicks
+prewarmer = AnalysisPrewarmer(schedule_cache, fetcher, engine_factory=new_engine, interval=900)
+
+def new_session():
+    return {
+        'engine': new_engine(),
+        # Serialises AI calls of one chat (they share conversation_history)
+        'lock': asyncio.Lock()
+    }
+
+# Global state: {chat_id: {'engine': AIEngine(), 'lock': asyncio.Lock(), 'game_id': analysed game}}
+# Idle chats are evicted; their history is spilled to disk and restored on return
+user_sessions = SessionStore(new_session, idle_ttl=3600, max_entries=1000, spill_dir="data/sessions")
 
 def get_session(chat_id):
-    if chat_id not in user_sessions:
-        user_sessions[chat_id] = {'engine': AIEngine(), 'fetcher': NHLAPIFetcher()}
-    return user_sessions[chat_id]
+    return user_sessions.get(chat_id)
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
@@ -39,12 +69,9 @@ async def games_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     
     try:
-        session = get_session(chat_id)
-        fetcher = session['fetcher']
-        
         await context.bot.send_message(chat_id=chat_id, text="🔄 Сканирую расписание НХЛ...")
         
-        games = fetcher.get_games_for_date()
+        games = await service.get_scheduled_games(schedule_cache)
         
         if not games:
             await context.bot.send_message(chat_id=chat_id, text="📅 На сегодня матчей не запланировано.")
@@ -94,39 +121,61 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         chat_id = update.effective_chat.id
         session = get_session(chat_id)
         
-        await query.edit_message_text(text=f"⏳ Загружаю статистику и H2H (ID {game_id})...")
+        # Spans below, also those in the pool threads, carry the game and chat
+        with tags(game_id=game_id, chat=chat_id), tracer.span("analysis_request"):
+            await query.edit_message_text(text=f"⏳ Загружаю статистику и H2H (ID {game_id})...")
         
-        # 1. Fetch details
-        fetcher = session['fetcher']
-        game_list = fetcher.get_games_for_date() # Need this to get basic info again or cache it
-        # Find the game object
-        selected_game = next((g for g in game_list if str(g.get('id') or g.get('gameId')) == str(game_id)), None)
+            # 1. Fetch details
+            # O(1) lookup in the shared schedule cache (no NHL API call when warm)
+            selected_game = await service.get_scheduled_game(schedule_cache, game_id)
         
-        if not selected_game:
-            await query.edit_message_text(text="❌ Ошибка: Матч не найден в кэше.")
-            return
+            if not selected_game:
+                await query.edit_message_text(text="❌ Ошибка: Матч не найден в кэше.")
+                return
 
-        details = fetcher.get_game_details(game_id)
-        
-        # 2. Prepare AI Prompt
-        payload = simplify_game_data(selected_game, details, fetcher)
-        
-        await context.bot.send_message(chat_id=chat_id, text="🧠 **DeepSeek анализирует матч...**\n_(Это может занять 10-20 секунд)_", parse_mode=constants.ParseMode.MARKDOWN)
-        
-        # 3. Call AI
-        engine = session['engine']
-        analysis = engine.analyze_match(payload)
+            engine = session['engine']
+            warm = prewarmer.get(game_id)
+            if warm:
+                # Pre-warmed: continue the chat from the stored analysis, no API calls
+                async with session['lock']:
+                    engine.load_analysis(warm['payload'], warm['analysis'])
+                    session['game_id'] = game_id
+                analysis = warm['analysis']
+            else:
+                analysis = None
+                try:
+                    details = await service.get_game_details(fetcher, game_id)
+                
+                    # 2. Prepare AI Prompt
+                    payload = await service.build_payload(selected_game, details, fetcher)
+                
+                    # 3. Call AI, streaming the answer into one message as it is written
+                    reply = StreamingMessage(context.bot, chat_id)
+                    await reply.start()
+                    async with session['lock']:
+                        async for chunk in service.stream(engine.stream_analysis, payload):
+                            await reply.append(chunk)
+                        await reply.finish()
+                        if engine.has_analysis():
+                            session['game_id'] = game_id  # follow-up questions are about this game
+                            prewarmer.put(game_id, payload, reply.text)
+
+                except Exception as e:
+                    logging.error(f"AI Error: {e}")
+                    await context.bot.send_message(chat_id=chat_id, text=f"⚠️ Ошибка получения ответа: {e}")
         
-        # 4. Send Result
-        # Escape markdown specific chars if needed, or rely on AI being good. 
-        # DeepSeek usually writes proper MD.
-        try:
-            await context.bot.send_message(chat_id=chat_id, text=analysis, parse_mode=constants.ParseMode.MARKDOWN)
-        except:
-            # Fallback if MD parsing fails
-            await context.bot.send_message(chat_id=chat_id, text=analysis)
+            # 4. Send Result (pre-warmed analysis; streamed ones are already on screen)
+            # Escape markdown specific chars if needed, or rely on AI being good. 
+            # DeepSeek usually writes proper MD.
+            if analysis:
+                with tracer.span("telegram_send"):
+                    try:
+                        await context.bot.send_message(chat_id=chat_id, text=analysis, parse_mode=constants.ParseMode.MARKDOWN)
+                    except:
+                        # Fallback if MD parsing fails
+                        await context.bot.send_message(chat_id=chat_id, text=analysis)
             
-        await context.bot.send_message(chat_id=chat_id, text="💬 **Чат открыт!**\nЗадайте вопрос по этому прогнозу или нажмите /games для нового матча.", parse_mode=constants.ParseMode.MARKDOWN)
+            await context.bot.send_message(chat_id=chat_id, text="💬 **Чат открыт!**\nЗадайте вопрос по этому прогнозу или нажмите /games для нового матча.", parse_mode=constants.ParseMode.MARKDOWN)
 
 async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
@@ -139,22 +188,21 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     engine = session.get('engine')
     if engine and hasattr(engine, 'conversation_history') and engine.conversation_history:
         # It's a follow-up question
-        await context.bot.send_chat_action(chat_id=chat_id, action=constants.ChatAction.TYPING)
+        with tags(game_id=session.get('game_id'), chat=chat_id), tracer.span("followup_request"):
+            await context.bot.send_chat_action(chat_id=chat_id, action=constants.ChatAction.TYPING)
         
-        try:
-            # Run blocking AI call in executor to not block bot loop
-            loop = asyncio.get_running_loop()
-            response = await loop.run_in_executor(None, engine.ask_followup, text)
-            
             try:
-                await update.message.reply_text(response, parse_mode=constants.ParseMode.MARKDOWN)
-            except Exception as e:
-                logging.error(f"Markdown error: {e}, sending plain text")
-                await update.message.reply_text(response) # Fallback to plain text
+                # Blocking AI stream runs on the service pool; the reply grows in place
+                reply = StreamingMessage(context.bot, chat_id, placeholder="💭 Думаю...")
+                await reply.start()
+                async with session['lock']:
+                    async for chunk in service.stream(engine.stream_followup, text):
+                        await reply.append(chunk)
+                    await reply.finish()
                 
-        except Exception as e:
-            logging.error(f"AI Error: {e}")
-            await update.message.reply_text(f"⚠️ Ошибка получения ответа: {e}")
+            except Exception as e:
+                logging.error(f"AI Error: {e}")
+                await update.message.reply_text(f"⚠️ Ошибка получения ответа: {e}")
             
     else:
         # If session is lost or fresh
@@ -172,5 +220,21 @@ if __name__ == '__main__':
     application.add_handler(CallbackQueryHandler(button_handler))
     application.add_handler(MessageHandler(filters.TEXT & (~filters.COMMAND), message_handler))
     
+    # NHL_METRICS_PORT: Prometheus /metrics on localhost; NHL_TRACE_FILE: JSONL of every span
+    tracer.configure_from_env()
+    tracer.register_gauges("sessions", user_sessions.gauges)
+    schedule_cache.start()
+    prewarmer.start()
+    
     print("🤖 Bot is running...")
-    application.run_polling()
+    try:
+        application.run_polling()
+    finally:
+        prewarmer.stop()
+        schedule_cache.stop()
+        service.shutdown()
+        logging.info(f"NHL API HTTP metrics: {fetcher.get_http_metrics()}")
+        logging.info(f"Sessions: {user_sessions.gauges()}")
+        if tracer.enabled:
+            logging.info(f"Stage timings: {tracer.summary()}")
+            tracer.close()
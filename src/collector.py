@@ -1,121 +1,291 @@
+import argparse
+import os
+import queue
+import signal
+import sys
+import threading
 import time
-import random
 from data_fetcher import FlashscoreParser
+from flashscore_feed import FlashscoreFeedClient
+from rate_limit import AdaptiveRateLimiter
+from results_parser import row_datetime
+from scrape_errors import BLOCKED, BROWSER_CRASH, CONNECTION, EMPTY, TIMEOUT, classify
 from storage_json import StorageJson
+from storage_sqlite import StorageSqlite, parse_start_time
 
-def run_collector():
+def run_collector(workers=1, rate=0.5, source="browser", since=None, max_rate=None):
+    """
+    Collects details of new finished matches.
+    `workers` browser instances fetch details in parallel. Page loads and
+    feed requests of all of them share one adaptive limiter: it starts at
+    `rate` requests per second, backs off on errors and blocking and climbs
+    back up to `max_rate` (default 2 x rate) while the site answers.
+    source="feed" reads the Flashscore data feeds over HTTP and only starts
+    a browser for matches the feed cannot serve.
+    Runs are incremental: the results list is read only down to the storage
+    watermark. since='YYYY-MM-DD' instead backfills every match from that date.
+    """
     print("=== NHL Data Collector Started ===")
-    
+
     # Initialize components
-    storage = StorageJson(filepath="data/nhl_data.json")
-    parser = FlashscoreParser(headless=True)
-    
+    storage = open_storage()
+    limiter = new_limiter(rate, max_rate, burst=workers)
+    parser = new_parser(source, limiter)
+
+    # SIGTERM (e.g. worker restart) unwinds like Ctrl+C so the buffer gets flushed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(1))
+
+    with storage:
+        _collect(storage, parser, workers=workers, since=since)
+
+def open_storage():
+    """The match database the collector writes to."""
+    # Writes are group-committed: every 20 matches or 30 s, and on exit
+    write_options = {
+        'batch_size': 20,
+        'flush_interval': 30,
+        'durability': os.getenv("NHL_STORAGE_DURABILITY", "fsync")
+    }
+    # NHL_STORAGE=sqlite switches to the indexed SQLite database
+    if os.getenv("NHL_STORAGE") == "sqlite":
+        return StorageSqlite(filepath="data/nhl_data.db", **write_options)
+    # Lazy: id index from the sidecar, records read on demand (collector only needs match_exists)
+    return StorageJson(filepath="data/nhl_data.json", lazy=True, **write_options)
+
+def new_limiter(rate=0.5, max_rate=None, burst=1):
+    """Adaptive limiter between rate / 10 and max_rate requests per second."""
+    max_rate = max_rate or rate * 2
+    return AdaptiveRateLimiter(rate=rate, burst=burst, min_rate=rate / 10, max_rate=max_rate,
+                               increase=max_rate / 20)
+
+def new_parser(source="browser", limiter=None):
+    feed = FlashscoreFeedClient(limiter=limiter) if source == "feed" else None
+    return FlashscoreParser(headless=True, feed=feed, limiter=limiter)
+
+def find_new_matches(parser, storage, since=None):
+    """
+    Finished matches from the results page that are not in the database yet,
+    and whether the list is complete. Without `since` older results are loaded
+    down to the watermark and the scan stops at the first row older than it:
+    everything before it was collected by an earlier complete run. If that row
+    is never reached, matches between the list and the watermark may be
+    missing, and the list is not complete.
+    """
+    watermark = None if since else storage.get_watermark()
+    if watermark:
+        print(f"Incremental run: matches after {watermark['start_time']} ({watermark['id']})")
+    elif since:
+        print(f"Backfill since {since}")
+
+    reached = []
+
+    def before_watermark(match):
+        when = row_datetime(match.get('time'))
+        if when and when < watermark['start_time']:
+            reached.append(match)
+            return True
+        return False
+
+    finished_matches = parser.get_finished_matches(
+        since=since,
+        stop=before_watermark if watermark else None,
+        load_until=watermark['start_time'][:10] if watermark else None
+    )
+    complete = not watermark or bool(reached)
+    if not complete:
+        print("Results list does not reach the watermark: the watermark will not move this run")
+    print(f"Found {len(finished_matches)} finished matches on the results page.")
+
+    new_matches = []
+    for match in finished_matches:
+        # Flashscore IDs usually look like 'g_1_E588Co9j'; the parser's full ID is used as the key
+        match_id = match.get('id')
+
+        # Filter out matches without scores (future matches might leak in)
+        has_score = match.get('home_score') is not None and match.get('away_score') is not None
+        if not has_score:
+            continue
+
+        if match_id and not storage.match_exists(match_id):
+            new_matches.append(match)
+
+    print(f"New matches to process: {len(new_matches)}")
+    print(f"Matches already in DB: {len(finished_matches) - len(new_matches)}")
+    if not new_matches and finished_matches and complete:
+        # Everything listed is stored: start incremental runs from the newest one
+        newest = storage.get_match(finished_matches[0]['id'])
+        if newest:
+            advance_watermark(storage, [newest])
+    return new_matches, complete
+
+def restart_driver(parser, pause=2):
+    parser.close_driver()
+    time.sleep(pause)
+    if not parser.feed:
+        parser.start_driver()  # with a feed the browser starts again only when needed
+
+def fetch_details(parser, match_url, max_retries=3, prefix=""):
+    """
+    get_match_details with retries. The error kind decides the recovery: a
+    new browser after a crash or connection error, a fresh tab after a
+    timeout, blocked/empty pages are retried once the shared limiter lets
+    the next request through.
+    """
+    for attempt in range(max_retries):
+        try:
+            return parser.get_match_details(match_url)
+        except Exception as details_error:
+            kind = classify(details_error)
+            print(f"{prefix}  [Attempt {attempt+1}/{max_retries}] Error fetching details ({kind}): {details_error}")
+            if attempt == max_retries - 1:
+                raise
+            if kind in (BROWSER_CRASH, CONNECTION):
+                print(f"{prefix}  ! {kind}, restarting driver...")
+                restart_driver(parser, pause=5)
+            elif kind == TIMEOUT and parser.driver:
+                parser.reset_driver()
+            elif kind not in (BLOCKED, EMPTY):
+                time.sleep(2)
+
+def _worker(name, parser, jobs, results):
+    """
+    Takes matches from `jobs` until it gets None and puts (name, match,
+    merged match data, None) or (name, match, None, error) into `results`;
+    ends with a (name, None, None, None) sentinel.
+    """
+    try:
+        if not parser.feed:
+            parser.start_driver()
+        while True:
+            match = jobs.get()
+            if match is None:
+                break
+            try:
+                details = fetch_details(parser, match['url'], prefix=f"[{name}]")
+                results.put((name, match, {**match, **details}, None))
+            except Exception as e:
+                print(f"[{name}] Error processing match {match.get('id')}: {e}")
+                results.put((name, match, None, str(e)))
+                # Drop the broken page state; the browser itself is recycled by page count / memory
+                if parser.driver:
+                    try:
+                        parser.reset_driver()
+                    except Exception:
+                        pass
+    except Exception as e:
+        print(f"[{name}] Worker stopped: {e}")
+    finally:
+        parser.close_driver()
+        print(f"[{name}] Wait times: {parser.get_wait_stats()}")
+        print(f"[{name}] Browser: {parser.browser.stats}")
+        results.put((name, None, None, None))
+
+def advance_watermark(storage, saved_matches):
+    """Moves the watermark to the newest saved match (only ever forward)."""
+    dated = [(parse_start_time(m.get('start_time')), m['id']) for m in saved_matches]
+    dated = [(when, match_id) for when, match_id in dated if when]
+    if not dated:
+        return
+    newest = max(dated)
+    current = storage.get_watermark()
+    if current and current['start_time'] >= newest[0]:
+        return
+    # Data first: the watermark must never point past matches that are not on disk yet
+    storage.save_data()
+    storage.set_watermark(*newest)
+    print(f"Watermark: {newest[0]} ({newest[1]})")
+
+def start_workers(parser, workers, jobs, results):
+    """
+    Starts `workers` _worker threads (the first one uses `parser`, the others
+    share its feed and rate limiter); returns their parsers.
+    """
+    parsers = [parser] + [FlashscoreParser(headless=True, feed=parser.feed, limiter=parser.limiter)
+                          for _ in range(workers - 1)]
+    for i, worker_parser in enumerate(parsers):
+        jobs.put(None)  # one stop marker per worker
+        threading.Thread(
+            target=_worker, args=(f"w{i + 1}", worker_parser, jobs, results),
+            name=f"collector-w{i + 1}", daemon=True
+        ).start()
+    return parsers
+
+def _collect(storage, parser, workers=1, since=None):
     try:
         # 1. Get list of all finished matches from the results page
         print("\n--- Step 1: Fetching list of finished matches ---")
-        finished_matches = parser.get_finished_matches()
-        print(f"Found {len(finished_matches)} finished matches on the results page.")
-        
-        # 2. Filter out matches we already have
-        new_matches = []
-        for match in finished_matches:
-            # Flashscore IDs usually look like 'g_1_E588Co9j' -> key is 'E588Co9j'
-            # Or we can just use the full ID if consistent. 
-            # Let's ensure we use the ID from the parser.
-            match_id = match.get('id')
-            
-            # Filter out matches without scores (future matches might leak in)
-            has_score = match.get('home_score') is not None and match.get('away_score') is not None
-            if not has_score:
-                continue
+        new_matches, complete = find_new_matches(parser, storage, since=since)
 
-            if match_id and not storage.match_exists(match_id):
-                new_matches.append(match)
-        
-        print(f"New matches to process: {len(new_matches)}")
-        print(f"Matches already in DB: {len(finished_matches) - len(new_matches)}")
-        
         if not new_matches:
             print("No new matches to collect. Exiting.")
             return
 
-        # 3. Process new matches
-        print("\n--- Step 2: Fetching details for new matches ---")
-        count = 0
-        
-        # Open driver for detailed fetching (get_finished_matches closes it)
-        parser.start_driver()
-        
+        # 2. Fetch details with a pool of browsers; this thread is the only storage writer
+        print(f"\n--- Step 2: Fetching details for new matches ({workers} workers) ---")
+        jobs = queue.Queue()
+        results = queue.Queue()
         for match in new_matches:
-            count += 1
-            match_url = match.get('url')
-            match_id = match.get('id')
-            
-            # Get full details first to populate start_time
-            print(f"\nProcessing {count}/{len(new_matches)}: {match['home']} vs {match['away']}...")
-            
-            if not match_url:
-                print(f"Skipping match {match_id}: No URL found")
+            if not match.get('url'):
+                print(f"Skipping match {match.get('id')}: No URL found")
                 continue
-                
-            try:
-                # Retry logic for fetching details
-                max_retries = 3
-                for attempt in range(max_retries):
-                    try:
-                        # Get full details
-                        details = parser.get_match_details(match_url)
-                        break # Success
-                    except Exception as details_error:
-                        print(f"  [Attempt {attempt+1}/{max_retries}] Error fetching details: {details_error}")
-                        # If connection error, restart driver
-                        if "Connection" in str(details_error) or "timeout" in str(details_error).lower():
-                            print("  ! Connection issue detected. Restarting driver...")
-                            parser.close_driver()
-                            time.sleep(5)
-                            parser.start_driver()
-                        else:
-                            time.sleep(2)
-                        
-                        if attempt == max_retries - 1:
-                            raise details_error
-                
-                # Merge basic info with details
-                full_data = {**match, **details}
-                
-                print(f"  > Date: {full_data.get('start_time', 'N/A')}")
-                
-                # Save to DB
-                storage.add_match(full_data)
-                
-                # Sleep to represent human behavior
-                sleep_time = random.uniform(2.5, 5.0)
-                print(f"Sleeping for {sleep_time:.2f}s...")
-                time.sleep(sleep_time)
-                
-                # Restart driver periodically to free memory
-                if count % 10 == 0:
-                    print(f"Restarting browser to clear memory (processed {count})...")
-                    parser.close_driver()
-                    time.sleep(3)
-                    parser.start_driver()
-                    
-            except Exception as e:
-                print(f"Error processing match {match_id}: {e}")
-                # Don't exit loop, try next match, but maybe restart driver first
-                try:
-                    parser.close_driver()
-                    time.sleep(2)
-                    parser.start_driver()
-                except:
-                    pass
-                
+            jobs.put(match)
+        total = jobs.qsize()
+
+        parsers = start_workers(parser, workers, jobs, results)
+
+        # 3. Save results as they arrive
+        started = time.monotonic()
+        running, done, saved = len(parsers), 0, []
+        while running:
+            name, match, full_data, _ = results.get()
+            if match is None:
+                running -= 1
+                continue
+            done += 1
+            if full_data is None:
+                continue
+            print(f"[{name}] {done}/{total}: {match['home']} vs {match['away']} > Date: {full_data.get('start_time', 'N/A')}")
+            storage.add_match(full_data)
+            saved.append(full_data)
+
+        elapsed = time.monotonic() - started
+        startup = sum(p.browser.stats['startup_seconds'] for p in parsers)
+        starts = sum(p.browser.stats['starts'] for p in parsers)
+        print(f"\nSaved {len(saved)}/{total} matches in {elapsed:.0f}s "
+              f"({len(saved) / elapsed * 60 if elapsed else 0:.1f} matches/min, {workers} workers)")
+        if parser.limiter:
+            print(f"Rate limiter: {parser.limiter.summary()}")
+        print(f"Browser startup: {starts} starts, {startup:.1f}s total")
+        
+        # A run with failures or a list that stopped short of the watermark leaves a gap;
+        # the next run has to look at those rows again
+        if len(saved) == total and complete:
+            advance_watermark(storage, saved)
+        elif not complete:
+            print("Results list did not reach the watermark, watermark not moved")
+        else:
+            print(f"{total - len(saved)} matches failed, watermark not moved")
+
     except Exception as e:
         print(f"Critical Collector Error: {e}")
     finally:
         print("\nClosing parser...")
         parser.close_driver()
+        print(f"Storage: {storage.get_stats_summary()}")
         print("Done.")
 
 if __name__ == "__main__":
-    run_collector()
+    cli = argparse.ArgumentParser(description="Collects finished NHL matches from Flashscore")
+    cli.add_argument("--workers", type=int, default=int(os.getenv("NHL_COLLECTOR_WORKERS", "1")),
+                     help="parallel browser instances")
+    cli.add_argument("--rate", type=float, default=float(os.getenv("NHL_COLLECTOR_RATE", "0.5")),
+                     help="starting requests per second across all workers")
+    cli.add_argument("--max-rate", type=float, default=float(os.getenv("NHL_COLLECTOR_MAX_RATE", "0")) or None,
+                     help="ceiling the rate climbs to while the site is healthy (default 2 x --rate)")
+    cli.add_argument("--source", choices=("browser", "feed"), default=os.getenv("NHL_COLLECTOR_SOURCE", "browser"),
+                     help="feed: HTTP data feeds with the browser as fallback")
+    cli.add_argument("--since", metavar="YYYY-MM-DD",
+                     help="backfill all finished matches from this date instead of an incremental run")
+    args = cli.parse_args()
+    run_collector(workers=max(1, args.workers), rate=args.rate, source=args.source, since=args.since,
+                  max_rate=args.max_rate)
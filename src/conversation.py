@@ -0,0 +1,91 @@
+def estimate_tokens(text):
+    """
+    Cheap token estimate without a tokenizer: ~3 characters per token
+    (Russian text tokenizes denser than English's ~4).
+    """
+    return len(text) // 3 + 1
+
+
+def count_message_tokens(messages):
+    # +4 per message for role/formatting overhead
+    return sum(estimate_tokens(m.get('content', '')) + 4 for m in messages)
+
+
+class ConversationHistory:
+    """
+    Chat history with a token budget.
+    The first `pinned` messages (system prompt, match prompt, analysis) are
+    always kept. When the history goes over `max_tokens`, the oldest
+    follow-up turns are dropped and their questions are kept as a short
+    summary note, so every request stays about the same size no matter
+    how long the chat runs.
+    Behaves like the plain list it replaces (append, len, indexing, iteration).
+    """
+
+    def __init__(self, messages=None, max_tokens=6000, pinned=3, summary_chars=600):
+        self.messages = list(messages or [])
+        self.max_tokens = max_tokens
+        self.pinned = pinned
+        self.summary_chars = summary_chars
+        self.summary = ""
+        self.dropped_turns = 0
+        self._enforce_budget()
+
+    def append(self, message):
+        self.messages.append(message)
+        self._enforce_budget()
+
+    def to_messages(self):
+        """Messages to send upstream: pinned turns, summary of dropped turns, recent turns."""
+        messages = self.messages[:self.pinned]
+        if self.summary:
+            messages.append({
+                "role": "system",
+                "content": f"Ранее в этом чате пользователь спрашивал (ответы опущены): {self.summary}"
+            })
+        return messages + self.messages[self.pinned:]
+
+    def token_count(self):
+        return count_message_tokens(self.to_messages())
+
+    def _enforce_budget(self):
+        # Never drop pinned turns or the newest message (the question being asked)
+        while self.token_count() > self.max_tokens and len(self.messages) > self.pinned + 1:
+            dropped = self.messages.pop(self.pinned)
+            if dropped['role'] == 'user':
+                self._remember(dropped['content'])
+                # Drop the answer together with its question
+                if len(self.messages) > self.pinned + 1 and self.messages[self.pinned]['role'] == 'assistant':
+                    self.messages.pop(self.pinned)
+                self.dropped_turns += 1
+
+    def _remember(self, question):
+        question = " ".join(question.split())
+        if len(question) > 80:
+            question = question[:77] + "..."
+        self.summary = f"{self.summary}; {question}" if self.summary else question
+        if len(self.summary) > self.summary_chars:
+            # Keep the most recent part of the summary
+            self.summary = "..." + self.summary[-(self.summary_chars - 3):]
+
+    def to_dict(self):
+        return {'messages': self.messages, 'summary': self.summary, 'dropped_turns': self.dropped_turns}
+
+    @classmethod
+    def from_dict(cls, state, **kwargs):
+        history = cls(**kwargs)
+        # Summary first: it counts against the budget the restored turns are trimmed to
+        history.messages = list(state['messages'])
+        history.summary = state.get('summary', "")
+        history.dropped_turns = state.get('dropped_turns', 0)
+        history._enforce_budget()
+        return history
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __getitem__(self, index):
+        return self.messages[index]
@@ -1,15 +1,91 @@
+import re
 import time
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
+from datetime import datetime
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
+from selenium.common.exceptions import TimeoutException
 from bs4 import BeautifulSoup
+from driver_manager import DriverManager
+from results_parser import parse_results_html, row_datetime
+from flashscore_feed import FeedError, map_stats
+from scrape_errors import BLOCKED, EMPTY, PAGE_KINDS, ScrapeError, classify, is_block_page
+
+_RE_FORM = re.compile(r'form')
+
+# Clicks the "show more matches" link at the bottom of a results list
+SHOW_MORE_JS = """
+var more = document.querySelector('a.event__more, [class*="event__more"]');
+if (more) { more.scrollIntoView(); more.click(); return true; }
+return false;
+"""
+ROW_TIMES_JS = "return Array.from(document.querySelectorAll('.event__match .event__time')).map(e => e.innerText);"
+
+def _until_datetime(until):
+    return datetime.strptime(until, "%Y-%m-%d").replace(hour=23, minute=59) if until else None
+
+def filter_window(matches, since=None, stop=None, until=None):
+    """
+    Rows (newest first) up to the first one where stop(match) is True, none
+    older than `since` or newer than `until` (YYYY-MM-DD). Row dates without
+    a year are placed in the year before `until` (default: now).
+    """
+    reference = _until_datetime(until)
+    selected = []
+    for match in matches:
+        if stop and stop(match):
+            break
+        when = row_datetime(match.get('time'), reference)
+        if when and ((since and when[:10] < since) or (until and when[:10] > until)):
+            continue
+        selected.append(match)
+    return selected
+
+def reaches_back(matches, since, until=None):
+    """True if the oldest dated row (rows are newest first) is before `since`."""
+    reference = _until_datetime(until)
+    for match in reversed(matches):
+        when = row_datetime(match.get('time'), reference)
+        if when:
+            return when[:10] < since
+    return False
 
 class FlashscoreParser:
-    def __init__(self, headless=True):
+    # Seconds to wait for each kind of content before extracting whatever is there
+    DEFAULT_WAIT_TIMEOUTS = {
+        'match_list': 10,  # .event__match rows on the fixtures/results pages
+        'header': 10,      # match page header with the start time
+        'h2h': 10,         # .h2h__row
+        'stats': 10,       # stat__row
+        'players': 10,     # ui-table__row
+        'team': 10
+    }
+
+    # Requests dropped by the resource-blocking profile (the parser only reads text)
+    BLOCKED_URLS = [
+        # Trailing * so that URLs with a query string (logo.png?v=3) match too
+        "*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.svg*", "*.ico*",
+        "*.woff*", "*.ttf*", "*.otf*", "*.mp4*",
+        "*doubleclick.net*", "*googlesyndication.com*", "*googletagservices.com*", "*adservice.google.*",
+        "*google-analytics.com*", "*googletagmanager.com*", "*facebook.net*", "*scorecardresearch.com*",
+        "*hotjar.com*", "*criteo.*", "*adnxs.com*", "*amazon-adsystem.com*", "*taboola.com*",
+        "*outbrain.com*", "*yandex.ru/metrika*", "*mc.yandex.ru*", "*onesignal.com*"
+    ]
+
+    def __init__(self, headless=True, wait_timeouts=None, single_navigation=True, feed=None,
+                 max_pages=150, max_rss_mb=1024, block_resources=True, limiter=None):
+        # feed: optional FlashscoreFeedClient tried before the browser for list/detail scraping
+        self.feed = feed
+        # limiter: AdaptiveRateLimiter shared by every page load and feed request (None: no limit)
+        self.limiter = limiter
+        if feed is not None and feed.limiter is None:
+            feed.limiter = limiter
+        # single_navigation: load a match page once and switch its tabs in place
+        self.single_navigation = single_navigation
+        self.page_loads = 0
+        self.wait_timeouts = {**self.DEFAULT_WAIT_TIMEOUTS, **(wait_timeouts or {})}
+        self.wait_stats = {}  # wait name -> {'count', 'timeouts', 'total', 'max'}
         self.base_url = "https://www.flashscorekz.com/hockey/usa/nhl/"
         self.options = Options()
         if headless:
@@ -19,15 +95,120 @@ class FlashscoreParser:
         self.options.add_argument("--disable-dev-shm-usage")
         self.options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
         
+        # block_resources: no images/fonts/ads/trackers, and don't wait for subresources
+        self.block_resources = block_resources
+        if block_resources:
+            self.options.add_experimental_option("prefs", {
+                "profile.managed_default_content_settings.images": 2,
+                "profile.default_content_setting_values.notifications": 2
+            })
+            self.options.add_argument("--blink-settings=imagesEnabled=false")
+            self.options.page_load_strategy = 'eager'
+        
+        # One warm browser, recycled by page count / memory (see DriverManager)
+        self.browser = DriverManager(self.options, max_pages=max_pages, max_rss_mb=max_rss_mb,
+                                     setup=self._block_requests if block_resources else None)
         self.driver = None
 
+    def _block_requests(self, driver):
+        """Drops BLOCKED_URLS requests in the browser via CDP."""
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.BLOCKED_URLS})
+        except Exception as e:
+            print(f"Could not enable request blocking: {e}")
+
+    def set_base_url(self, base_url):
+        """Points the parser (and its feed) at another competition page, e.g. an archive season."""
+        self.base_url = base_url
+        if self.feed:
+            self.feed.results_url = base_url + "results/"
+
     def start_driver(self):
-        service = Service(ChromeDriverManager().install())
-        self.driver = webdriver.Chrome(service=service, options=self.options)
+        self.driver = self.browser.get()
+
+    def reset_driver(self):
+        """Fresh tab in the running browser (starts one if needed)."""
+        self.driver = self.browser.reset()
 
     def close_driver(self):
-        if self.driver:
-            self.driver.quit()
+        self.browser.quit()
+        self.driver = None
+
+    def _load_page(self, url):
+        """
+        Full page load (counted in page_loads); the browser may be recycled first.
+        Waits for the rate limiter; raises ScrapeError(BLOCKED) on an anti-bot page.
+        """
+        if self.limiter:
+            self.limiter.acquire()
+        self.driver = self.browser.get()
+        try:
+            self.driver.get(url)
+        except Exception as e:
+            self._report(classify(e))
+            raise
+        self.page_loads += 1
+        self.browser.page_loaded()
+        if is_block_page(self.driver.title):
+            self._report(BLOCKED)
+            raise ScrapeError(f"Blocked page at {url}: {self.driver.title}", BLOCKED)
+
+    def _report(self, kind):
+        """Tells the rate limiter how the last page load went (kind None: healthy)."""
+        if not self.limiter:
+            return
+        if kind is None:
+            self.limiter.on_success()
+        else:
+            self.limiter.on_error(kind)
+
+    def _open_match_route(self, base_match_url, route, in_page):
+        """
+        Opens a hash route of the match page. in_page=True switches the route in
+        the already loaded SPA instead of loading the page again.
+        """
+        if in_page:
+            self.driver.execute_script("window.location.hash = arguments[0];", route)
+            self._wait_for('header', ".duelParticipant__startTime")
+        else:
+            self._load_page(base_match_url + route)
+            found = self._wait_for('header', ".duelParticipant__startTime")
+            self._report(None if found else EMPTY)
+
+    def _wait_for(self, name, css_selector):
+        """
+        Waits until an element matching css_selector is present (at most
+        wait_timeouts[name] seconds) and records how long it took.
+        Returns False on timeout; callers still extract what has rendered.
+        """
+        start = time.perf_counter()
+        try:
+            WebDriverWait(self.driver, self.wait_timeouts[name]).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, css_selector))
+            )
+            found = True
+        except TimeoutException:
+            found = False
+        elapsed = time.perf_counter() - start
+        stats = self.wait_stats.setdefault(name, {'count': 0, 'timeouts': 0, 'total': 0.0, 'max': 0.0})
+        stats['count'] += 1
+        stats['timeouts'] += 0 if found else 1
+        stats['total'] += elapsed
+        stats['max'] = max(stats['max'], elapsed)
+        return found
+
+    def get_wait_stats(self):
+        """Average/max seconds spent in each kind of wait."""
+        return {
+            name: {
+                'count': s['count'],
+                'timeouts': s['timeouts'],
+                'avg': round(s['total'] / s['count'], 3),
+                'max': round(s['max'], 3)
+            }
+            for name, s in self.wait_stats.items()
+        }
 
     def get_upcoming_matches(self):
         """
@@ -37,14 +218,11 @@ class FlashscoreParser:
             self.start_driver()
         
         print(f"Navigating to {self.base_url}...")
-        self.driver.get(self.base_url)
+        self._load_page(self.base_url)
         
         try:
-            # Wait for the main container to load
-            WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "sportName"))
-            )
-            time.sleep(3) # Extra wait for dynamic content
+            # Wait for the match rows themselves, not just the container
+            self._wait_for('match_list', ".event__match")
             
             soup = BeautifulSoup(self.driver.page_source, 'html.parser')
             
@@ -78,74 +256,95 @@ class FlashscoreParser:
             print(f"Error fetching matches: {e}")
             return []
 
-    def get_finished_matches(self):
+    def get_finished_matches(self, since=None, stop=None, until=None, strict=False, load_until=None):
         """
         Fetches finished (past) matches with scores.
+        since: 'YYYY-MM-DD' - load older results until that date, skip rows before it.
+        until: 'YYYY-MM-DD' - skip rows after it (for archive seasons: also the year reference).
+        stop(match): rows are newest first; scanning ends at the first row where it returns True.
+        strict: raise when the results page cannot be read instead of returning [].
+        load_until: 'YYYY-MM-DD' - load older results until that date like `since`,
+            without skipping rows (e.g. down to the watermark; `stop` ends the scan).
         """
-        # Restart driver to avoid session issues
-        self.close_driver()
-        self.start_driver()
+        # Oldest date the list has to reach back to
+        reach = min(d for d in (since, load_until) if d) if (since or load_until) else None
+        if self.feed:
+            try:
+                matches = self.feed.get_finished_matches()
+                if not matches:
+                    print("Feed returned no finished matches, using the browser")
+                elif reach and not reaches_back(matches, reach, until):
+                    # The feed only holds the first results page; older rows need "show more"
+                    print(f"Feed rows do not reach back to {reach}, using the browser")
+                else:
+                    window = filter_window(matches, since, until=until)
+                    if window or not (since or until):
+                        return filter_window(window, stop=stop)
+                    # e.g. a feed of another season than the requested range
+                    print(f"No feed rows in {since or ''} .. {until or ''}, using the browser")
+            except FeedError as e:
+                print(f"Feed error, using the browser: {e}")
+        
+        # Fresh tab instead of a browser restart to avoid session issues
+        self.reset_driver()
         
         # Flashscore results page for hockey
         results_url = self.base_url + "results/"
         print(f"Navigating to {results_url}...")
-        self.driver.get(results_url)
+        self._load_page(results_url)
         
         try:
-            WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "sportName"))
-            )
-            time.sleep(3)
+            found = self._wait_for('match_list', ".event__match")
+            self._report(None if found else EMPTY)
+            if not found and strict:
+                raise ScrapeError(f"No result rows at {results_url}", EMPTY)
+            if reach:
+                self._load_results_until(reach, until)
             
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-            
-            matches = []
-            import re
-            
-            # Find all match links (eventRowLink contains full URL)
-            match_links = soup.find_all('a', class_=re.compile(r'eventRowLink'))
-            
-            print(f"Found {len(match_links)} finished match rows.")
-            
-            for link in match_links:
-                # Get the parent row for team/score data
-                row = link.find_parent('div', class_=re.compile(r'event__match'))
-                if not row:
-                    row = link  # fallback
-                
-                home_team = row.find('div', class_=re.compile(r'event__participant--home'))
-                away_team = row.find('div', class_=re.compile(r'event__participant--away'))
-                home_score = row.find('span', class_=re.compile(r'event__score--home'))
-                away_score = row.find('span', class_=re.compile(r'event__score--away'))
-                
-                # Fallback to div if span not found
-                if not home_score:
-                    home_score = row.find('div', class_=re.compile(r'event__score--home'))
-                if not away_score:
-                    away_score = row.find('div', class_=re.compile(r'event__score--away'))
-                
-                if home_team and away_team:
-                    match_info = {
-                        'home': home_team.get_text(strip=True),
-                        'away': away_team.get_text(strip=True),
-                        'home_score': home_score.get_text(strip=True) if home_score else "?",
-                        'away_score': away_score.get_text(strip=True) if away_score else "?",
-                        'id': row.get('id', ''),
-                        'url': link.get('href', '')  # Full match URL
-                    }
-                    matches.append(match_info)
+            # One pass over the page source (lxml when installed), see results_parser
+            matches = filter_window(parse_results_html(self.driver.page_source, stop=stop), since, until=until)
+            print(f"Found {len(matches)} finished match rows.")
             
             return matches
 
         except Exception as e:
+            if strict:
+                raise
             print(f"Error fetching finished matches: {e}")
             return []
 
-    def get_match_details(self, match_url):
+    def _load_results_until(self, since, until=None, max_clicks=50):
+        """Clicks "show more" until the oldest loaded row is before `since` or nothing more loads."""
+        reference = _until_datetime(until)
+        for _ in range(max_clicks):
+            times = self.driver.execute_script(ROW_TIMES_JS) or []
+            oldest = row_datetime(times[-1], reference) if times else None
+            if oldest and oldest[:10] < since:
+                return
+            if not self.driver.execute_script(SHOW_MORE_JS):
+                return
+            try:
+                WebDriverWait(self.driver, self.wait_timeouts['match_list']).until(
+                    lambda d: len(d.execute_script(ROW_TIMES_JS) or []) > len(times)
+                )
+            except TimeoutException:
+                return
+
+    def get_match_details(self, match_url, single_navigation=None):
         """
         Fetches detailed match data including H2H, statistics, and player stats.
         match_url should be the full URL from the results page (e.g., /match/hockey/team1/team2/?mid=XXX)
+        With single_navigation (default: the parser's setting) the page is loaded
+        once and the statistics tabs are opened in place: 1 page load instead of 3.
         """
+        if single_navigation is None:
+            single_navigation = self.single_navigation
+        if self.feed:
+            try:
+                return self.feed.get_match_details(match_url)
+            except FeedError as e:
+                print(f"Feed error, using the browser: {e}")
+        
         if not self.driver:
             self.start_driver()
         
@@ -164,11 +363,13 @@ class FlashscoreParser:
             'player_stats': None
         }
         
+        # Becomes True once the match page is loaded and later tabs can be switched in place
+        in_page = False
+        
         # 1. Get Match Date & H2H
         try:
-            h2h_url = base_match_url + "#/h2h"
-            self.driver.get(h2h_url)
-            time.sleep(4)
+            self._open_match_route(base_match_url, "#/h2h", in_page)
+            in_page = single_navigation
             
             # Extract date/time from the page header
             try:
@@ -186,7 +387,7 @@ class FlashscoreParser:
             return 'not found';
             """
             self.driver.execute_script(click_tab_js)
-            time.sleep(3)
+            self._wait_for('h2h', ".h2h__row")
             
             # Use JavaScript to extract H2H data using .h2h__row
             js_script = """
@@ -236,13 +437,14 @@ class FlashscoreParser:
             
             match_data['h2h'] = h2h_data
         except Exception as e:
+            if classify(e) in PAGE_KINDS:
+                raise  # the page itself is gone or blocked: let the caller retry/restart
             print(f"Error fetching H2H: {e}")
         
         # Get match statistics using JavaScript execution
         try:
-            stats_url = base_match_url + "#/match-summary/match-statistics"
-            self.driver.get(stats_url)
-            time.sleep(4)
+            self._open_match_route(base_match_url, "#/match-summary/match-statistics", in_page)
+            in_page = single_navigation
             
             # Click on "Статистика" tab to ensure it's active
             click_tab_js = """
@@ -267,7 +469,7 @@ class FlashscoreParser:
             return 'not found';
             """
             self.driver.execute_script(click_tab_js)
-            time.sleep(3)
+            self._wait_for('stats', '[class*="stat__row"], [class*="statRow"]')
             
             # Use JavaScript to extract stats using specific stat__ classes
             js_script = """
@@ -319,47 +521,17 @@ class FlashscoreParser:
             extracted_stats = self.driver.execute_script(js_script)
             
             
-            stats = {
-                'shots_on_goal': {'home': '?', 'away': '?'},
-                'shots_missed': {'home': '?', 'away': '?'},
-                'saves': {'home': '?', 'away': '?'},
-                'penalty_minutes': {'home': '?', 'away': '?'},
-                'powerplay_goals': {'home': '?', 'away': '?'},
-                'blocked_shots': {'home': '?', 'away': '?'},
-                'faceoffs_won': {'home': '?', 'away': '?'},
-                'raw': extracted_stats  # Store all extracted stats
-            }
-            
-            # Map extracted stats to our keys
-            if extracted_stats:
-                for key, val in extracted_stats.items():
-                    key_lower = key.lower()
-                    # Flashscore uses "ударов в створ" or "броски в створ"
-                    if ('удар' in key_lower or 'брос' in key_lower) and 'створ' in key_lower:
-                        stats['shots_on_goal'] = val
-                    elif 'отраж' in key_lower or 'сейв' in key_lower:
-                        stats['saves'] = val
-                    elif 'штраф' in key_lower:
-                        stats['penalty_minutes'] = val
-                    elif 'большинств' in key_lower:
-                        stats['powerplay_goals'] = val
-                    elif 'блок' in key_lower:
-                        stats['blocked_shots'] = val
-                    elif 'вбрас' in key_lower:
-                        stats['faceoffs_won'] = val
-                    elif 'мимо' in key_lower:
-                        stats['shots_missed'] = val
-
+            stats = map_stats(extracted_stats)
             
             match_data['stats'] = stats
         except Exception as e:
+            if classify(e) in PAGE_KINDS:
+                raise  # the page itself is gone or blocked: let the caller retry/restart
             print(f"Error fetching stats: {e}")
         
         # Get player statistics using JavaScript execution
         try:
-            player_stats_url = base_match_url + "#/match-summary/player-statistics"
-            self.driver.get(player_stats_url)
-            time.sleep(4)
+            self._open_match_route(base_match_url, "#/match-summary/player-statistics", in_page)
             
             # Click on "Статистика игроков" tab
             click_tab_js = """
@@ -369,7 +541,7 @@ class FlashscoreParser:
             return 'not found';
             """
             self.driver.execute_script(click_tab_js)
-            time.sleep(3)
+            self._wait_for('players', '.ui-table__row, [class*="playerStatsTable__row"]')
             
             # Use JavaScript to extract player data using ui-table__row
             js_script = """
@@ -445,6 +617,8 @@ class FlashscoreParser:
             
             match_data['player_stats'] = players
         except Exception as e:
+            if classify(e) in PAGE_KINDS:
+                raise  # the page itself is gone or blocked: let the caller retry/restart
             print(f"Error fetching player stats: {e}")
         
         return match_data
@@ -458,8 +632,8 @@ class FlashscoreParser:
         
         try:
             print(f"Fetching team stats: {team_url}")
-            self.driver.get(team_url)
-            time.sleep(3)
+            self._load_page(team_url)
+            self._wait_for('team', 'span[class*="form"]')
             soup = BeautifulSoup(self.driver.page_source, 'html.parser')
             
             team_data = {
@@ -469,8 +643,7 @@ class FlashscoreParser:
             }
             
             # Extract form and records
-            import re
-            form_elements = soup.find_all('span', class_=re.compile(r'form'))
+            form_elements = soup.find_all('span', class_=_RE_FORM)
             for el in form_elements[:5]:
                 team_data['form'].append(el.get_text(strip=True))
             
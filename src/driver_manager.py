@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+try:
+    import psutil
+except ImportError:  # optional; on Linux the process tree is read from /proc
+    psutil = None
+
+
+def _children_from_proc():
+    """pid -> list of child pids, from /proc/<pid>/stat."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; ppid is the 2nd field after ')'
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def _rss_from_proc(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def process_tree_rss(pid):
+    """Resident memory in bytes of a process and all its descendants (0 if unknown)."""
+    if psutil:
+        try:
+            root = psutil.Process(pid)
+            return sum(p.memory_info().rss for p in [root] + root.children(recursive=True))
+        except psutil.Error:
+            return 0
+    if not os.path.isdir("/proc"):
+        return 0
+    children = _children_from_proc()
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        total += _rss_from_proc(current)
+        stack.extend(children.get(current, []))
+    return total
+
+
+class DriverManager:
+    """
+    Keeps one warm Chrome for a parser instead of restarting it per task.
+    The chromedriver path is resolved once per process (or taken from
+    CHROMEDRIVER_PATH). The browser is recycled when it has loaded
+    `max_pages` pages or its process tree uses more than `max_rss_mb`;
+    between tasks reset() swaps in a fresh tab instead of a new process.
+    setup(driver) runs for every new browser and every fresh tab (CDP
+    settings such as blocked URLs apply per tab).
+    """
+    _driver_path = None
+    _path_lock = threading.Lock()
+
+    def __init__(self, options, max_pages=150, max_rss_mb=1024, setup=None):
+        self.options = options
+        self.setup = setup
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.driver = None
+        self.pages = 0  # page loads since the browser started
+        self.stats = {'starts': 0, 'startup_seconds': 0.0, 'resets': 0, 'recycled_pages': 0, 'recycled_memory': 0}
+
+    @classmethod
+    def driver_path(cls):
+        with cls._path_lock:
+            if cls._driver_path is None:
+                cls._driver_path = os.getenv("CHROMEDRIVER_PATH") or ChromeDriverManager().install()
+            return cls._driver_path
+
+    def start(self):
+        start = time.perf_counter()
+        self.driver = webdriver.Chrome(service=Service(self.driver_path()), options=self.options)
+        if self.setup:
+            self.setup(self.driver)
+        self.pages = 0
+        self.stats['starts'] += 1
+        self.stats['startup_seconds'] += time.perf_counter() - start
+        return self.driver
+
+    def get(self):
+        """Returns the warm driver, starting or recycling the browser when needed."""
+        if self.driver is None:
+            return self.start()
+        if self.pages >= self.max_pages:
+            self.stats['recycled_pages'] += 1
+            return self.restart()
+        if self.max_rss_mb and self.rss_bytes() > self.max_rss_mb * 1024 * 1024:
+            print(f"Browser uses {self.rss_bytes() // (1024 * 1024)} MB, recycling")
+            self.stats['recycled_memory'] += 1
+            return self.restart()
+        return self.driver
+
+    def page_loaded(self):
+        self.pages += 1
+
+    def rss_bytes(self):
+        """RSS of chromedriver and every Chrome process under it."""
+        try:
+            return process_tree_rss(self.driver.service.process.pid)
+        except AttributeError:
+            return 0
+
+    def reset(self):
+        """Drops page state by switching to a fresh tab; restarts the browser if that fails."""
+        if self.driver is None:
+            return self.start()
+        try:
+            old_handles = self.driver.window_handles
+            self.driver.switch_to.new_window('tab')
+            fresh = self.driver.current_window_handle
+            for handle in old_handles:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+            self.driver.switch_to.window(fresh)
+            if self.setup:
+                self.setup(self.driver)
+            self.stats['resets'] += 1
+            return self.driver
+        except Exception as e:
+            print(f"Tab reset failed ({e}), restarting browser")
+            return self.restart()
+
+    def restart(self):
+        self.quit()
+        return self.start()
+
+    def quit(self):
+        if self.driver:
+            try:
+                self.driver.quit()
+            except Exception as e:
+                print(f"Error closing browser: {e}")
+            self.driver = None
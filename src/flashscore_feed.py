@@ -0,0 +1,264 @@
+import re
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from scrape_errors import OTHER, ScrapeError, classify, kind_for_status
+
+# Feed format: records separated by '~', fields by '¬', key and value by '÷'
+RECORD_SEP = '~'
+FIELD_SEP = '¬'
+VALUE_SEP = '÷'
+
+_INITIAL_RESULTS = re.compile(r"initialFeeds\['results'\]\s*=\s*\{\s*data:\s*`([^`]*)`")
+_MID_QUERY = re.compile(r"[?&]mid=([A-Za-z0-9]+)")
+_MID_PATH = re.compile(r"/match/([A-Za-z0-9]{8})(?:/|$)")
+
+
+class FeedError(ScrapeError):
+    """The feed could not be fetched or parsed; callers fall back to the browser."""
+
+    def __init__(self, message, kind=OTHER):
+        super().__init__(message, kind)
+
+
+def parse_feed(text):
+    """Splits a feed response into a list of {key: value} records."""
+    records = []
+    for chunk in text.split(RECORD_SEP):
+        record = {}
+        for field in chunk.split(FIELD_SEP):
+            if VALUE_SEP in field:
+                key, value = field.split(VALUE_SEP, 1)
+                record[key] = value
+        if record:
+            records.append(record)
+    return records
+
+
+def map_stats(extracted_stats):
+    """Maps raw {label: {'home', 'away'}} statistics to the keys used by the analysis."""
+    stats = {
+        'shots_on_goal': {'home': '?', 'away': '?'},
+        'shots_missed': {'home': '?', 'away': '?'},
+        'saves': {'home': '?', 'away': '?'},
+        'penalty_minutes': {'home': '?', 'away': '?'},
+        'powerplay_goals': {'home': '?', 'away': '?'},
+        'blocked_shots': {'home': '?', 'away': '?'},
+        'faceoffs_won': {'home': '?', 'away': '?'},
+        'raw': extracted_stats  # Store all extracted stats
+    }
+
+    # Map extracted stats to our keys
+    if extracted_stats:
+        for key, val in extracted_stats.items():
+            key_lower = key.lower()
+            # Flashscore uses "ударов в створ" or "броски в створ"
+            if ('удар' in key_lower or 'брос' in key_lower) and 'створ' in key_lower:
+                stats['shots_on_goal'] = val
+            elif 'отраж' in key_lower or 'сейв' in key_lower:
+                stats['saves'] = val
+            elif 'штраф' in key_lower:
+                stats['penalty_minutes'] = val
+            elif 'большинств' in key_lower:
+                stats['powerplay_goals'] = val
+            elif 'блок' in key_lower:
+                stats['blocked_shots'] = val
+            elif 'вбрас' in key_lower:
+                stats['faceoffs_won'] = val
+            elif 'мимо' in key_lower:
+                stats['shots_missed'] = val
+    return stats
+
+
+def _format_time(timestamp, fmt):
+    try:
+        return datetime.fromtimestamp(int(timestamp)).strftime(fmt)
+    except (TypeError, ValueError):
+        return None
+
+
+class FlashscoreFeedClient:
+    """
+    HTTP-only access to the data feeds the Flashscore pages load themselves.
+    Returns the same dicts as FlashscoreParser.get_finished_matches() and
+    get_match_details() without starting a browser. Uses one pooled session.
+    With a `limiter` (AdaptiveRateLimiter) every request waits for it and
+    reports how the site answered.
+    """
+    # Feed names per match id
+    FEEDS = {
+        'core': "dc_1_{mid}",          # match header: start time
+        'h2h': "df_hh_1_{mid}",
+        'stats': "df_st_1_{mid}",
+        'player_stats': "df_ps_1_{mid}"
+    }
+    # Field codes of the player statistics feed
+    PLAYER_KEYS = {
+        'PN': 'name', 'PT': 'team', 'PG': 'goals', 'PA': 'assists', 'PP': 'points',
+        'PM': 'plusMinus', 'PI': 'pim', 'PS': 'shots', 'PO': 'toi', 'PV': 'saves', 'PR': 'savePercent'
+    }
+
+    def __init__(self, site_url="https://www.flashscorekz.com", results_path="/hockey/usa/nhl/results/",
+                 feed_path="/x/feed/", fsign="SW9D1eZo", timeout=10, pool_size=8, limiter=None):
+        self.site_url = site_url.rstrip('/')
+        self.results_url = self.site_url + results_path
+        self.feed_url = self.site_url + feed_path
+        self.timeout = timeout
+        self.limiter = limiter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            'x-fsign': fsign,
+            'Referer': self.site_url + "/",
+            'User-Agent': "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+        })
+        self.requests_sent = 0
+
+    def _get(self, url):
+        if self.limiter:
+            self.limiter.acquire()
+        self.requests_sent += 1
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except requests.RequestException as e:
+            kind = classify(e)
+            self._report(kind)
+            raise FeedError(f"{url}: {e}", kind) from e
+        if response.status_code != 200:
+            kind = kind_for_status(response.status_code)
+            self._report(kind)
+            raise FeedError(f"{url}: HTTP {response.status_code}", kind)
+        self._report(None)
+        response.encoding = 'utf-8'
+        return response.text
+
+    def _report(self, kind):
+        if not self.limiter:
+            return
+        if kind is None:
+            self.limiter.on_success()
+        else:
+            self.limiter.on_error(kind)
+
+    def get_feed(self, name):
+        """Fetches and parses one feed, e.g. 'df_st_1_Abc12345'."""
+        return parse_feed(self._get(self.feed_url + name))
+
+    def get_finished_matches(self):
+        """Finished matches from the results page's embedded feed (same dicts as the browser parser)."""
+        match = _INITIAL_RESULTS.search(self._get(self.results_url))
+        if not match:
+            raise FeedError(f"No results feed in {self.results_url}")
+
+        matches = []
+        for record in parse_feed(match.group(1)):
+            mid = record.get('AA')
+            if not mid or not record.get('AE') or not record.get('AF'):
+                continue
+            if record.get('WU') and record.get('WV'):
+                url = f"/match/hockey/{record['WU']}/{record['WV']}/?mid={mid}"
+            else:
+                url = f"/match/{mid}/"
+            matches.append({
+                'home': record['AE'],
+                'away': record['AF'],
+                'home_score': record.get('AG', "?"),
+                'away_score': record.get('AH', "?"),
+                'id': f"g_4_{mid}",  # same as the DOM row id
+                'url': url,
+                'time': _format_time(record.get('AD'), "%d.%m.%Y %H:%M") or "N/A"
+            })
+        return matches
+
+    @staticmethod
+    def match_id_from_url(match_url):
+        found = _MID_QUERY.search(match_url) or _MID_PATH.search(match_url)
+        if not found:
+            raise FeedError(f"No match id in {match_url}")
+        return found.group(1)
+
+    def get_match_details(self, match_url):
+        """
+        Match date, H2H, statistics and player stats from the match feeds.
+        A section that fails is None (as in the browser parser); FeedError if
+        the match itself cannot be read or every section failed.
+        """
+        mid = self.match_id_from_url(match_url)
+        if match_url.startswith('/'):
+            match_url = self.site_url + match_url
+
+        core = self.get_feed(self.FEEDS['core'].format(mid=mid))
+        start = next((r['DC'] for r in core if 'DC' in r), None)
+        match_data = {
+            'url': match_url,
+            'start_time': _format_time(start, "%d.%m.%Y %H:%M") or 'N/A',
+            'h2h': None,
+            'stats': None,
+            'player_stats': None
+        }
+
+        for key, parse in (('h2h', self._parse_h2h), ('stats', self._parse_stats), ('player_stats', self._parse_players)):
+            try:
+                match_data[key] = parse(self.get_feed(self.FEEDS[key].format(mid=mid)))
+            except FeedError as e:
+                print(f"Error fetching {key} feed: {e}")
+
+        if not (match_data['h2h'] or match_data['stats'] or match_data['player_stats']):
+            raise FeedError(f"No detail feeds for match {mid}")
+        return match_data
+
+    @staticmethod
+    def _parse_h2h(records):
+        # Sections start with a KA heading: home form, away form, head-to-head (overall tab first)
+        sections = []
+        for record in records:
+            if 'KA' in record:
+                sections.append([])
+            elif 'KC' in record and sections:
+                date = _format_time(record['KC'], "%d.%m.%y") or ''
+                text = f"{date} {record.get('KJ', '')} {record.get('KL', '')} {record.get('KK', '')}".strip()
+                sections[-1].append(text[:100])
+        sections = (sections + [[], [], []])[:3]
+        return {
+            'home_last5': sections[0][:5],
+            'away_last5': sections[1][:5],
+            'head_to_head': sections[2][:10],
+            'all_matches': (sections[0] + sections[1] + sections[2])[:15]
+        }
+
+    @staticmethod
+    def _parse_stats(records):
+        # Statistics come per period; the first SE group is the whole match
+        extracted = {}
+        groups = 0
+        for record in records:
+            if 'SE' in record:
+                groups += 1
+                if groups > 1:
+                    break
+            elif 'SG' in record:
+                extracted[record['SG']] = {'home': record.get('SH', '0'), 'away': record.get('SI', '0')}
+        return map_stats(extracted)
+
+    def _parse_players(self, records):
+        result = {'skaters': [], 'goalies': []}
+        goalies = False
+        for record in records:
+            if 'PH' in record:  # section heading
+                goalies = 'вратар' in record['PH'].lower() or 'goalie' in record['PH'].lower()
+                continue
+            if 'PN' not in record:
+                continue
+            player = {field: record.get(code, '-') for code, field in self.PLAYER_KEYS.items()}
+            if goalies:
+                result['goalies'].append({k: player[k] for k in ('name', 'team', 'toi', 'saves', 'savePercent')})
+            else:
+                result['skaters'].append({k: player[k] for k in ('name', 'team', 'goals', 'assists', 'points', 'plusMinus', 'pim', 'shots', 'toi')})
+        return {'skaters': result['skaters'], 'goalies': result['goalies'], 'raw': result}
+
+    def close(self):
+        self.session.close()
@@ -3,6 +3,9 @@ from ai_engine import AIEngine
 from datetime import datetime
 import json
 
+from tracing import traced
+
+@traced("simplify_game_data")
 def simplify_game_data(game_info, details, fetcher=None):
     """
     Combines Schedule info + Matchup/Boxscore + Standings to query AI.
@@ -29,17 +32,14 @@ def simplify_game_data(game_info, details, fetcher=None):
     }
     
     # 1. Get Standings if possible (for form)
+    # Prebuilt abbrev -> team index, refreshed by the fetcher once per TTL window
     standings_map = {}
-    if fetcher:
+    if details.get('standings'):
+        # Snapshot already gathered alongside boxscore/matchup
+        standings_map = details['standings']['by_abbrev']
+    elif fetcher:
         try:
-            std = fetcher.get_standings()
-            if std and 'standings' in std:
-                for team in std['standings']:
-                    # Map by abbrev
-                    # Structure found: team['teamAbbrev']['default']
-                    raw_abb = team.get('teamAbbrev', {})
-                    abb = clean_name(raw_abb)
-                    standings_map[abb] = team
+            standings_map = fetcher.get_standings_snapshot()['by_abbrev']
         except: pass
         
     # Helper to extract team form
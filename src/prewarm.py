@@ -0,0 +1,124 @@
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ai_engine import AIEngine
+from main import simplify_game_data
+from schedule_cache import game_key
+from tracing import tags
+
+
+def payload_fingerprint(payload):
+    """Stable hash of the AI input; a changed fingerprint means the analysis is outdated."""
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class AnalysisPrewarmer:
+    """
+    Background scheduler that runs the baseline DeepSeek analysis for every
+    game on today's schedule before anyone asks for it.
+    Results are stored by game_id together with the fingerprint of the payload
+    they were computed from; each pass rebuilds the payloads and only games
+    whose inputs changed are re-analysed, so AI cost per game does not depend
+    on the number of users.
+    """
+
+    def __init__(self, schedule_cache, fetcher, engine_factory=AIEngine, interval=900, workers=2):
+        self.schedule_cache = schedule_cache
+        self.fetcher = fetcher
+        self.engine_factory = engine_factory
+        self.interval = interval
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prewarm")
+        self._store = {}  # game_id -> {'fingerprint', 'payload', 'analysis', 'computed_at'}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def get(self, game_id):
+        """Returns the stored analysis entry for a game, or None if not warmed yet."""
+        return self._store.get(str(game_id))
+
+    def put(self, game_id, payload, analysis):
+        """Stores an analysis (also used by on-demand requests so they warm the store too)."""
+        entry = {
+            'fingerprint': payload_fingerprint(payload),
+            'payload': payload,
+            'analysis': analysis,
+            'computed_at': time.time()
+        }
+        with self._lock:
+            self._store[str(game_id)] = entry
+        return entry
+
+    def warm_game(self, game):
+        """Builds the payload for a game and analyses it if its inputs changed."""
+        game_id = game_key(game)
+        with tags(game_id=game_id, chat="prewarm"):
+            return self._warm(game, game_id)
+
+    def _warm(self, game, game_id):
+        details = self.fetcher.get_game_details(game_id, include_standings=True)
+        if not details:
+            return None
+        payload = simplify_game_data(game, details, self.fetcher)
+
+        current = self.get(game_id)
+        if current and current['fingerprint'] == payload_fingerprint(payload):
+            return current
+
+        engine = self.engine_factory()
+        analysis = engine.analyze_match(payload)
+        if not engine.has_analysis():
+            # analyze_match returns error text on failure; don't cache it
+            print(f"Prewarm failed for game {game_id}: {analysis}")
+            return None
+        return self.put(game_id, payload, analysis)
+
+    def run_once(self, date_str=None):
+        """One pass over the schedule; returns the number of games with a fresh analysis."""
+        games = self.schedule_cache.get_games(date_str)
+
+        # Forget games that left the schedule (previous days)
+        live_ids = {game_key(g) for g in games}
+        with self._lock:
+            for game_id in list(self._store):
+                if game_id not in live_ids:
+                    del self._store[game_id]
+
+        warmed = 0
+        for result in self._pool.map(self._warm_safely, games):
+            if result:
+                warmed += 1
+        print(f"Prewarm pass done: {warmed}/{len(games)} games ready")
+        return warmed
+
+    def _warm_safely(self, game):
+        try:
+            return self.warm_game(game)
+        except Exception as e:
+            print(f"Prewarm error for game {game_key(game)}: {e}")
+            return None
+
+    def start(self):
+        """Starts the background pass loop (daemon thread)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    self.run_once()
+                except Exception as e:
+                    print(f"Prewarm pass error: {e}")
+                self._stop.wait(self.interval)
+
+        self._thread = threading.Thread(target=loop, name="prewarm", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,101 @@
+import threading
+import time
+
+from scrape_errors import BLOCKED, SITE_KINDS
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket shared by every scraping worker.
+    `rate` is the sustained number of requests per second across all workers,
+    `burst` how many may go out back to back after an idle period.
+    """
+
+    def __init__(self, rate=0.5, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0  # total seconds callers spent waiting
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _take(self, now):
+        """Takes a token (returns 0) or returns the seconds until one is available. Called under the lock."""
+        self._refill(now)
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """Blocks until a request may be sent; returns the seconds waited."""
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = self._take(now)
+                if not delay:
+                    waited = now - start
+                    self.waited += waited
+                    return waited
+            time.sleep(delay)
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """
+    Token bucket whose rate follows the site's health (additive increase,
+    multiplicative decrease): each healthy response adds `increase` requests
+    per second up to `max_rate`; a timeout, connection error or empty page
+    multiplies the rate by `backoff`; a blocking signal (captcha, HTTP
+    403/429) drops it to `min_rate` and holds every caller for `cooldown`
+    seconds. Errors that are not the site's (browser crashes, parse errors)
+    leave the rate alone.
+    """
+
+    def __init__(self, rate=0.5, burst=1, min_rate=0.05, max_rate=1.0, increase=0.05, backoff=0.5, cooldown=60):
+        super().__init__(rate=min(max(rate, min_rate), max_rate), burst=burst)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self._paused_until = 0.0
+        self.stats = {'successes': 0, 'errors': {}, 'slowdowns': 0, 'pauses': 0}
+
+    def _take(self, now):
+        if now < self._paused_until:
+            return self._paused_until - now
+        return super()._take(now)
+
+    def _set_rate(self, rate, now):
+        self._refill(now)  # tokens earned so far count at the old rate
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+
+    def on_success(self):
+        with self._lock:
+            self.stats['successes'] += 1
+            self._set_rate(self.rate + self.increase, time.monotonic())
+
+    def on_error(self, kind):
+        with self._lock:
+            self.stats['errors'][kind] = self.stats['errors'].get(kind, 0) + 1
+            if kind not in SITE_KINDS:
+                return
+            now = time.monotonic()
+            self.stats['slowdowns'] += 1
+            if kind == BLOCKED:
+                self.stats['pauses'] += 1
+                self._set_rate(self.min_rate, now)
+                self._tokens = 0
+                self._paused_until = max(self._paused_until, now + self.cooldown)
+            else:
+                self._set_rate(self.rate * self.backoff, now)
+
+    def summary(self):
+        with self._lock:
+            return {**self.stats, 'errors': dict(self.stats['errors']), 'rate': round(self.rate, 3),
+                    'waited': round(self.waited, 1)}
@@ -0,0 +1,211 @@
+import re
+from datetime import datetime
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:  # optional; the stdlib one-pass parser is used instead
+    lxml_html = None
+
+# Class markers of a results row and its fields
+ROW_CLASS = "event__match"
+LINK_CLASS = "eventRowLink"
+FIELD_CLASSES = (
+    ('home', "event__participant--home"),
+    ('away', "event__participant--away"),
+    ('home_score', "event__score--home"),
+    ('away_score', "event__score--away"),
+    ('time', "event__time"),
+)
+VOID_TAGS = frozenset(("area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"))
+
+_RE_ROW = re.compile(ROW_CLASS)
+_RE_LINK = re.compile(LINK_CLASS)
+_RE_FIELDS = [(key, re.compile(cls)) for key, cls in FIELD_CLASSES]
+
+if lxml_html is not None:
+    _X_LINKS = etree.XPath(f"//a[contains(@class, '{LINK_CLASS}')]")
+    _X_ROW = etree.XPath(f"ancestor::div[contains(@class, '{ROW_CLASS}')][1]")
+    _X_FIELDS = [
+        (key, etree.XPath(f".//*[(self::div or self::span) and contains(@class, '{cls}')][1]"))
+        for key, cls in FIELD_CLASSES
+    ]
+
+
+class _StopParsing(Exception):
+    pass
+
+
+def row_datetime(time_text, now=None):
+    """
+    'YYYY-MM-DD HH:MM' for a results-row time such as '12.10. 02:00' (the
+    year is the latest one that does not put the match in the future), or
+    for a full '12.10.2024 02:00'. None if the text is not a date.
+    """
+    if not time_text:
+        return None
+    text = time_text.strip()
+    for fmt in ("%d.%m.%Y %H:%M", "%d.%m.%y %H:%M", "%d.%m.%Y"):
+        try:
+            return datetime.strptime(text, fmt).strftime("%Y-%m-%d %H:%M")
+        except ValueError:
+            continue
+    now = now or datetime.now()
+    try:
+        parsed = datetime.strptime(f"{text.split()[0]}{now.year} {text.split()[1]}", "%d.%m.%Y %H:%M")
+    except (ValueError, IndexError):
+        return None
+    if parsed > now:
+        parsed = parsed.replace(year=now.year - 1)
+    return parsed.strftime("%Y-%m-%d %H:%M")
+
+
+def _match_info(row_id, url, fields, stop=None):
+    if 'home' not in fields or 'away' not in fields:
+        return None
+    info = {
+        'home': fields['home'],
+        'away': fields['away'],
+        'home_score': fields.get('home_score', "?"),
+        'away_score': fields.get('away_score', "?"),
+        'id': row_id,
+        'url': url,
+        'time': fields.get('time', "N/A")
+    }
+    if stop and stop(info):
+        raise _StopParsing()
+    return info
+
+
+class _RowCollector(HTMLParser):
+    """Single pass over the page: collects rows without building a tree."""
+
+    def __init__(self, stop=None):
+        super().__init__(convert_charrefs=True)
+        self.stop = stop
+        self.matches = []
+        self._row = None        # current row: {'id', 'url', 'fields'}
+        self._depth = 0         # open elements inside the current row
+        self._field = None      # (key, depth) of the field whose text is being read
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        if self._row is None:
+            if tag != 'div':
+                return
+            attrs = dict(attrs)
+            if ROW_CLASS not in (attrs.get('class') or ''):
+                return
+            self._row = {'id': attrs.get('id', ''), 'url': None, 'fields': {}}
+            self._depth = 1
+            return
+
+        if tag in VOID_TAGS:
+            return
+        self._depth += 1
+        if self._field is not None:
+            return
+        attrs = dict(attrs)
+        cls = attrs.get('class') or ''
+        if tag == 'a' and LINK_CLASS in cls and self._row['url'] is None:
+            self._row['url'] = attrs.get('href', '')
+        elif tag in ('div', 'span'):
+            for key, marker in FIELD_CLASSES:
+                if marker in cls and key not in self._row['fields']:
+                    self._field = (key, self._depth)
+                    self._text = []
+                    break
+
+    def handle_endtag(self, tag):
+        if self._row is None or tag in VOID_TAGS:
+            return
+        if self._field is not None and self._depth == self._field[1]:
+            self._row['fields'][self._field[0]] = "".join(self._text)
+            self._field = None
+        self._depth -= 1
+        if self._depth == 0:
+            row, self._row = self._row, None
+            if row['url'] is not None:
+                info = _match_info(row['id'], row['url'], row['fields'], self.stop)
+                if info:
+                    self.matches.append(info)
+
+    def handle_data(self, data):
+        if self._field is not None:
+            text = data.strip()
+            if text:
+                self._text.append(text)
+
+
+def _parse_stream(page_html, stop=None):
+    collector = _RowCollector(stop)
+    try:
+        collector.feed(page_html)
+        collector.close()
+    except _StopParsing:
+        pass
+    return collector.matches
+
+
+def _text(element):
+    return "".join(t.strip() for t in element.itertext())
+
+
+def _parse_lxml(page_html, stop=None):
+    matches = []
+    for link in _X_LINKS(lxml_html.fromstring(page_html)):
+        rows = _X_ROW(link)
+        row = rows[0] if rows else link
+        fields = {}
+        for key, query in _X_FIELDS:
+            found = query(row)
+            if found:
+                fields[key] = _text(found[0])
+        try:
+            info = _match_info(row.get('id', ''), link.get('href', ''), fields, stop)
+        except _StopParsing:
+            break
+        if info:
+            matches.append(info)
+    return matches
+
+
+def _parse_bs4(page_html, stop=None):
+    """The original BeautifulSoup walk; kept as the reference implementation."""
+    soup = BeautifulSoup(page_html, 'html.parser')
+    matches = []
+    for link in soup.find_all('a', class_=_RE_LINK):
+        row = link.find_parent('div', class_=_RE_ROW) or link
+        fields = {}
+        for key, pattern in _RE_FIELDS:
+            # Scores are spans on most pages, divs on some
+            el = row.find('span' if key in ('home_score', 'away_score') else 'div', class_=pattern)
+            if el is None and key in ('home_score', 'away_score'):
+                el = row.find('div', class_=pattern)
+            if el is not None:
+                fields[key] = el.get_text(strip=True)
+        try:
+            info = _match_info(row.get('id', ''), link.get('href', ''), fields, stop)
+        except _StopParsing:
+            break
+        if info:
+            matches.append(info)
+    return matches
+
+
+BACKENDS = {'stream': _parse_stream, 'bs4': _parse_bs4}
+if lxml_html is not None:
+    BACKENDS['lxml'] = _parse_lxml
+
+
+def parse_results_html(page_html, backend=None, stop=None):
+    """
+    Finished match rows of a results page as dicts
+    (home, away, home_score, away_score, id, url, time).
+    backend: 'lxml' (default when installed), 'stream' (stdlib, one pass) or 'bs4'.
+    stop(match) returning True ends the scan at that row (rows are newest first).
+    """
+    backend = backend or ('lxml' if 'lxml' in BACKENDS else 'stream')
+    return BACKENDS[backend](page_html, stop)
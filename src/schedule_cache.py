@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+
+def game_key(game):
+    """Schedule games carry either 'id' or 'gameId'; callback data uses it as a string."""
+    return str(game.get('id') or game.get('gameId'))
+
+
+class ScheduleCache:
+    """
+    Process-wide cache of the daily NHL schedule, shared by all chats.
+    Entries are keyed by date and expire after `ttl` seconds; stale entries
+    are still served while a background thread refreshes them, so only the
+    very first request of a date ever waits on the NHL API.
+    """
+
+    def __init__(self, fetcher, ttl=300, max_dates=3):
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self.max_dates = max_dates
+        self._entries = {}      # date -> {'games': list, 'fetched_at': float}
+        self._game_index = {}   # game_id (str) -> game dict, across cached dates
+        self._lock = threading.Lock()
+        self._load_locks = defaultdict(threading.Lock)
+        self._refreshing = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _today(self):
+        return datetime.now().strftime("%Y-%m-%d")
+
+    def _is_stale(self, entry):
+        return time.monotonic() - entry['fetched_at'] > self.ttl
+
+    def _refresh(self, date_str):
+        """Fetches the schedule for a date and swaps it into the cache."""
+        games = self.fetcher.get_games_for_date(date_str)
+        with self._lock:
+            old = self._entries.get(date_str)
+            # get_games_for_date returns [] on errors: keep serving the last good copy
+            if not games and old and old['games']:
+                old['fetched_at'] = time.monotonic()
+                return old
+            if old:
+                for g in old['games']:
+                    self._game_index.pop(game_key(g), None)
+            entry = {'games': games, 'fetched_at': time.monotonic()}
+            self._entries[date_str] = entry
+            for g in games:
+                self._game_index[game_key(g)] = g
+            self._evict_old_dates()
+            return entry
+
+    def _evict_old_dates(self):
+        for date_str in sorted(self._entries)[:-self.max_dates]:
+            for g in self._entries.pop(date_str)['games']:
+                self._game_index.pop(game_key(g), None)
+
+    def _refresh_in_background(self, date_str):
+        with self._lock:
+            if date_str in self._refreshing:
+                return
+            self._refreshing.add(date_str)
+
+        def worker():
+            try:
+                self._refresh(date_str)
+            except Exception as e:
+                print(f"Schedule refresh error for {date_str}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(date_str)
+
+        threading.Thread(target=worker, name=f"schedule-refresh-{date_str}", daemon=True).start()
+
+    def get_games(self, date_str=None):
+        """Returns the games for a date (today by default), fetching only on a cold cache."""
+        date_str = date_str or self._today()
+        entry = self._entries.get(date_str)
+        if entry is None:
+            # Cold cache: concurrent callers for the same date share one fetch
+            with self._load_locks[date_str]:
+                entry = self._entries.get(date_str)
+                if entry is None:
+                    entry = self._refresh(date_str)
+        elif self._is_stale(entry):
+            self._refresh_in_background(date_str)
+        return entry['games']
+
+    def get_game(self, game_id, date_str=None):
+        """O(1) lookup of a scheduled game by id; loads the date's schedule on a miss."""
+        game = self._game_index.get(str(game_id))
+        if game is None:
+            self.get_games(date_str)
+            game = self._game_index.get(str(game_id))
+        return game
+
+    def start(self, interval=None):
+        """Starts a daemon thread that keeps today's schedule warm."""
+        if self._thread and self._thread.is_alive():
+            return
+        interval = interval or max(self.ttl / 2, 1)
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    self._refresh(self._today())
+                except Exception as e:
+                    print(f"Schedule refresh error: {e}")
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=loop, name="schedule-cache", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
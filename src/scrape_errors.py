@@ -0,0 +1,84 @@
+import http.client
+import socket
+
+import requests
+from selenium.common.exceptions import (
+    InvalidSessionIdException,
+    NoSuchWindowException,
+    TimeoutException,
+    WebDriverException,
+)
+from urllib3.exceptions import MaxRetryError, ProtocolError
+
+# Error kinds
+TIMEOUT = 'timeout'              # the site answered too slowly
+CONNECTION = 'connection'        # network error between the browser/client and the site
+BLOCKED = 'blocked'              # captcha, access denied, HTTP 403/429
+EMPTY = 'empty'                  # page loaded but held none of the expected data
+BROWSER_CRASH = 'browser_crash'  # Chrome or chromedriver is gone
+OTHER = 'other'
+
+# Kinds that say something about the site's health (the rate limiter reacts to them)
+SITE_KINDS = (TIMEOUT, CONNECTION, BLOCKED, EMPTY)
+# Kinds after which nothing more can be read from the current page
+PAGE_KINDS = (CONNECTION, BLOCKED, BROWSER_CRASH)
+
+# Page titles of anti-bot / error pages
+BLOCK_MARKERS = ("just a moment", "attention required", "access denied", "captcha", "доступ запрещен", "403 forbidden", "too many requests")
+
+# Chrome network error codes that mean the site did not answer
+_NET_ERRORS = ("net::ERR_CONNECTION", "net::ERR_NAME_NOT_RESOLVED", "net::ERR_INTERNET_DISCONNECTED",
+               "net::ERR_TIMED_OUT", "net::ERR_NETWORK_CHANGED", "net::ERR_EMPTY_RESPONSE", "net::ERR_PROXY")
+
+
+class ScrapeError(Exception):
+    """A scraping failure with its kind (one of the constants above)."""
+
+    def __init__(self, message, kind=OTHER):
+        super().__init__(message)
+        self.kind = kind
+
+
+def is_block_page(title):
+    title = (title or "").lower()
+    return any(marker in title for marker in BLOCK_MARKERS)
+
+
+def kind_for_status(status):
+    if status in (403, 429):
+        return BLOCKED
+    if status in (502, 503, 504):
+        return TIMEOUT
+    return OTHER
+
+
+def classify(error):
+    """Maps an exception from Selenium, requests or the parsers to an error kind."""
+    if isinstance(error, ScrapeError):
+        return error.kind
+    if isinstance(error, TimeoutException):
+        return TIMEOUT
+    if isinstance(error, (InvalidSessionIdException, NoSuchWindowException)):
+        return BROWSER_CRASH
+    if isinstance(error, WebDriverException):
+        message = error.msg or ""
+        if "net::ERR_TIMED_OUT" in message:
+            return TIMEOUT
+        if any(code in message for code in _NET_ERRORS):
+            return CONNECTION
+        # chromedriver answers but Chrome is gone
+        if "chrome not reachable" in message or "session deleted" in message or "disconnected" in message:
+            return BROWSER_CRASH
+        return OTHER
+    if isinstance(error, requests.Timeout):
+        return TIMEOUT
+    if isinstance(error, requests.ConnectionError):
+        return CONNECTION
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return kind_for_status(error.response.status_code)
+    # Selenium talks to chromedriver over HTTP: these mean the driver process died
+    if isinstance(error, (MaxRetryError, ProtocolError, ConnectionRefusedError, http.client.RemoteDisconnected)):
+        return BROWSER_CRASH
+    if isinstance(error, socket.timeout):
+        return TIMEOUT
+    return OTHER
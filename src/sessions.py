@@ -0,0 +1,159 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class SessionStore:
+    """
+    Per-chat sessions ({'engine', 'lock', ...}) with an idle TTL and an LRU cap.
+    Evicted sessions can spill their conversation history to `spill_dir`,
+    so a user who comes back later continues the same chat; spill files of
+    chats that do not come back within `spill_ttl` are deleted by the sweep.
+    Used from the bot's event loop; the lock is for gauges(), which the
+    metrics endpoint calls from its own thread.
+    """
+
+    def __init__(self, factory, idle_ttl=3600, max_entries=1000, spill_dir=None, spill_ttl=2 * 86400, sweep_interval=60):
+        self.factory = factory
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self.spill_dir = spill_dir
+        self.spill_ttl = spill_ttl
+        self.sweep_interval = sweep_interval
+        self._sessions = OrderedDict()  # chat_id -> session, least recently used first
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self._last_spill_sweep = None
+        self.evicted = 0
+        self.restored = 0
+        self.spills_expired = 0
+
+    def get(self, chat_id):
+        """Returns the chat's session, creating (or restoring from disk) it if needed."""
+        now = time.monotonic()
+        if now - self._last_sweep > self.sweep_interval:
+            self.evict_idle()
+
+        with self._lock:
+            session = self._sessions.get(chat_id)
+            if session is None:
+                session = self.factory()
+                self._restore(chat_id, session)
+                self._sessions[chat_id] = session
+                self._enforce_cap()
+            else:
+                self._sessions.move_to_end(chat_id)
+            session['last_seen'] = now
+        return session
+
+    def evict_idle(self):
+        """Evicts sessions idle for longer than idle_ttl; returns how many were evicted."""
+        self._last_sweep = time.monotonic()
+        cutoff = self._last_sweep - self.idle_ttl
+        with self._lock:
+            idle = [chat_id for chat_id, s in self._sessions.items() if s.get('last_seen', 0) < cutoff]
+            evicted = sum(1 for chat_id in idle if self._evict(chat_id))
+        # Listing the spill directory is slower: at most once per idle_ttl
+        due = self._last_spill_sweep is None or self._last_sweep - self._last_spill_sweep >= self.idle_ttl
+        if self.spill_dir and due:
+            self._last_spill_sweep = self._last_sweep
+            self.expire_spills()
+        return evicted
+
+    def expire_spills(self):
+        """Deletes spill files older than spill_ttl (chats that never came back)."""
+        cutoff = time.time() - self.spill_ttl
+        removed = 0
+        try:
+            names = os.listdir(self.spill_dir)
+        except OSError:
+            return 0
+        for name in names:
+            path = os.path.join(self.spill_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        with self._lock:
+            self.spills_expired += removed
+        return removed
+
+    def _enforce_cap(self):
+        # Oldest first; never the session that was just added
+        for chat_id in list(self._sessions)[:-1]:
+            if len(self._sessions) <= self.max_entries:
+                break
+            self._evict(chat_id)
+
+    def _evict(self, chat_id):
+        session = self._sessions.get(chat_id)
+        lock = session.get('lock')
+        if lock is not None and lock.locked():
+            return False  # an AI call is running for this chat
+        self._spill(chat_id, session)
+        del self._sessions[chat_id]
+        self.evicted += 1
+        return True
+
+    def _spill_path(self, chat_id):
+        return os.path.join(self.spill_dir, f"{chat_id}.json")
+
+    def _spill(self, chat_id, session):
+        engine = session.get('engine')
+        if not self.spill_dir or engine is None or not getattr(engine, 'conversation_history', None):
+            return
+        path = self._spill_path(chat_id)
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with open(path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(engine.export_history(), f, ensure_ascii=False)
+            os.replace(path + ".tmp", path)
+        except (OSError, TypeError) as e:
+            print(f"Session spill error for {chat_id}: {e}")
+
+    def _restore(self, chat_id, session):
+        if not self.spill_dir:
+            return
+        path = self._spill_path(chat_id)
+        if not os.path.exists(path):
+            return
+        try:
+            if time.time() - os.path.getmtime(path) <= self.spill_ttl:
+                with open(path, 'r', encoding='utf-8') as f:
+                    session['engine'].restore_history(json.load(f))
+                self.restored += 1
+            os.remove(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Session restore error for {chat_id}: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def __contains__(self, chat_id):
+        return chat_id in self._sessions
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def gauges(self):
+        """Live sessions, approximate bytes of conversation text held, eviction counters."""
+        # Snapshot under the lock, count outside it: the event loop must not wait for a scrape
+        with self._lock:
+            sessions = list(self._sessions.values())
+            counters = {
+                'live_sessions': len(sessions),
+                'evicted_total': self.evicted,
+                'restored_total': self.restored,
+                'spills_expired_total': self.spills_expired
+            }
+        bytes_held = 0
+        for session in sessions:
+            history = getattr(session.get('engine'), 'conversation_history', None) or []
+            bytes_held += sum(len(m.get('content', '').encode('utf-8')) for m in list(history))
+            bytes_held += len(getattr(history, 'summary', '').encode('utf-8'))
+        return {**counters, 'bytes_held': bytes_held}
@@ -1,11 +1,78 @@
 import json
+import mmap
 import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Records are written as {"id": "...", "match": ...}: the id can be read without parsing the match
+_ID_PREFIX = re.compile(rb'^\{"id": ("(?:[^"\\]|\\.)*")')
+
+def _record_id(line):
+    m = _ID_PREFIX.match(line)
+    if m:
+        return json.loads(m.group(1))
+    return json.loads(line)["id"]
 
 class StorageJson:
-    def __init__(self, filepath="data/nhl_data.json"):
+    """
+    Match database stored as an append-only JSONL log.
+    Every add_match appends one record (`{"id": ..., "match": {...}}`) instead of
+    rewriting the whole file; an in-memory id -> (offset, length) index points at
+    the latest record of each match. Overwritten records are dropped by compact(),
+    which writes a new file and atomically renames it over the old one.
+    A torn last line after a crash is cut off on load; a corrupt line elsewhere
+    is skipped (counted as dead, so compact() drops it) and the records after
+    it stay readable.
+    
+    lazy=True skips the full log scan at startup: the index is loaded from a
+    sidecar file (`<log>.idx`, only records appended after it was saved are
+    scanned) and records are decoded on demand from a memory-mapped log.
+    
+    Writes are group-committed: add_match buffers records and they are appended
+    in one write every `batch_size` records or `flush_interval` seconds, on
+    flush() and on close() (also via `with StorageJson(...) as storage:`).
+    durability: 'fsync' - fsync every batch, 'flush' - hand each batch to the OS,
+    'none' - leave it to Python's file buffer until close.
+    """
+    DURABILITY_LEVELS = ('fsync', 'flush', 'none')
+
+    def __init__(self, filepath="data/nhl_data.json", compact_ratio=0.5, compact_min=100, lazy=False,
+                 batch_size=1, flush_interval=None, durability='flush'):
+        if durability not in self.DURABILITY_LEVELS:
+            raise ValueError(f"durability must be one of {self.DURABILITY_LEVELS}")
+        # filepath is the legacy single-JSON database; the log lives next to it
         self.filepath = filepath
+        self.log_path = os.path.splitext(filepath)[0] + ".jsonl"
+        self.index_path = self.log_path + ".idx"
+        self.watermark_path = os.path.splitext(filepath)[0] + ".watermark.json"
+        self.lazy = lazy
+        self._mmap = None
+        self.compact_ratio = compact_ratio
+        self.compact_min = compact_min
+        self.index = {}  # match_id -> (offset, length) of its latest record
+        self.dead_records = 0
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self._pending = OrderedDict()  # match_id -> match_data not yet written
+        self._last_flush = time.monotonic()
+        self.batches_written = 0
+        self._lock = threading.RLock()
         self.ensure_directory()
-        self.data = self.load_data()
+        self.migrate_legacy()
+        self.load_data()
+        self._open_files()
+        
+        self._stop_flusher = threading.Event()
+        if flush_interval:
+            threading.Thread(target=self._flush_periodically, name="storage-flush", daemon=True).start()
+
+    def _open_files(self):
+        self._writer = open(self.log_path, 'ab')
+        self._reader = open(self.log_path, 'rb')
+        self._mmap = None
 
     def ensure_directory(self):
         """Creates the data directory if it doesn't exist."""
@@ -13,29 +80,183 @@ class StorageJson:
         if directory and not os.path.exists(directory):
             os.makedirs(directory)
 
-    def load_data(self):
-        """Loads existing data from the JSON file."""
-        if not os.path.exists(self.filepath):
-            return {"matches": {}}  # Dictionary for O(1) lookups by ID
-        
+    def migrate_legacy(self):
+        """One-time conversion of the old {"matches": {...}} JSON file into the log."""
+        if os.path.exists(self.log_path) or not os.path.exists(self.filepath):
+            return
         try:
             with open(self.filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            return {"matches": {}}
+                matches = json.load(f).get("matches", {})
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Legacy database {self.filepath} unreadable, not migrated: {e}")
+            return
+        self._write_log(self.log_path, matches.items())
+        print(f"Migrated {len(matches)} matches from {self.filepath} to {self.log_path}")
+
+    @staticmethod
+    def _encode(match_id, match_data):
+        record = {"id": match_id, "match": match_data}
+        return (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+
+    def _write_log(self, path, items):
+        """Writes a complete log to a temp file and atomically renames it into place."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            for match_id, match_data in items:
+                f.write(self._encode(match_id, match_data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def load_data(self):
+        """Builds the id -> offset index (from the sidecar in lazy mode, else by scanning the log)."""
+        self.index = {}
+        self.dead_records = 0
+        if not os.path.exists(self.log_path):
+            return self.index
+
+        start = self._load_index_sidecar() if self.lazy else 0
+        scanned = self._scan_log(start)
+        if self.lazy and (scanned or not os.path.exists(self.index_path)):
+            self._save_index()
+        return self.index
+
+    def _scan_log(self, start):
+        """Indexes records from byte `start` to the end of the log; returns how many were read."""
+        good_end = start  # end of the last complete line
+        count = 0
+        with open(self.log_path, 'rb') as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn write from a crash: only the last line can lack its newline
+                try:
+                    match_id = _record_id(line)
+                except (ValueError, KeyError, TypeError):
+                    print(f"Skipping corrupt record at byte {good_end} of {self.log_path}")
+                    self.dead_records += 1
+                else:
+                    if match_id in self.index:
+                        self.dead_records += 1
+                    self.index[match_id] = (good_end, len(line))
+                    count += 1
+                good_end += len(line)
+
+        if good_end < os.path.getsize(self.log_path):
+            print(f"Discarding {os.path.getsize(self.log_path) - good_end} bytes of incomplete data at end of {self.log_path}")
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(good_end)
+        return count
+
+    def _load_index_sidecar(self):
+        """Loads the saved index; returns the log offset it covers (0 if unusable)."""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            log_size = saved['log_size']
+            index = {k: tuple(v) for k, v in saved['index'].items()}
+            if log_size > os.path.getsize(self.log_path):
+                raise ValueError("log is shorter than the index")
+            # Cheap consistency check: the last indexed record must still be where the index says
+            if index:
+                last_id, (offset, length) = max(index.items(), key=lambda kv: kv[1][0])
+                with open(self.log_path, 'rb') as f:
+                    f.seek(offset)
+                    if _record_id(f.read(length)) != last_id:
+                        raise ValueError("index does not match log")
+        except (OSError, ValueError, KeyError) as e:
+            if os.path.exists(self.index_path):
+                print(f"Rebuilding index for {self.log_path}: {e}")
+            return 0
+        self.index = index
+        self.dead_records = saved.get('dead_records', 0)
+        return log_size
+
+    def _save_index(self):
+        """Writes the id -> offset index sidecar (atomic rename)."""
+        state = {
+            # Everything scanned so far, including skipped corrupt lines (callers flush first)
+            'log_size': os.path.getsize(self.log_path),
+            'dead_records': self.dead_records,
+            'index': self.index
+        }
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    def _read_record(self, offset, length):
+        if self.durability == 'none':
+            self._writer.flush()  # written batches may still sit in Python's buffer
+        if not self.lazy:
+            self._reader.seek(offset)
+            return self._reader.read(length)
+        # Remap when the log has grown past the current mapping
+        if self._mmap is None or offset + length > len(self._mmap):
+            if self._mmap is not None:
+                self._mmap.close()
+            self._mmap = mmap.mmap(self._reader.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap[offset:offset + length]
 
     def save_data(self):
-        """Saves current data to the JSON file."""
+        """Writes pending records and makes the whole log durable (fsync)."""
+        with self._lock:
+            self.flush()
+            self._writer.flush()
+            os.fsync(self._writer.fileno())
+
+    def flush(self):
+        """Appends all buffered records in one write, honouring the durability level."""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._pending:
+                return 0
+            offset = self._writer.tell()
+            lines = []
+            for match_id, match_data in self._pending.items():
+                line = self._encode(match_id, match_data)
+                if match_id in self.index:
+                    self.dead_records += 1
+                self.index[match_id] = (offset, len(line))
+                offset += len(line)
+                lines.append(line)
+            self._writer.write(b"".join(lines))
+            if self.durability != 'none':
+                self._writer.flush()
+            if self.durability == 'fsync':
+                os.fsync(self._writer.fileno())
+            count = len(self._pending)
+            self._pending.clear()
+            self.batches_written += 1
+            if self.dead_records > self.compact_min and self.dead_records > self.compact_ratio * len(self.index):
+                self.compact()
+            return count
+
+    def _flush_periodically(self):
+        while not self._stop_flusher.wait(self.flush_interval):
+            if self._pending and time.monotonic() - self._last_flush >= self.flush_interval:
+                try:
+                    self.flush()
+                except (OSError, ValueError) as e:
+                    print(f"Background flush error: {e}")
+
+    def get_watermark(self):
+        """{'start_time': 'YYYY-MM-DD HH:MM', 'id': ...} of the newest fully collected match, or None."""
         try:
-            with open(self.filepath, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, indent=2, ensure_ascii=False)
-            print(f"Database pending saved to {self.filepath}")
-        except Exception as e:
-            print(f"Error saving database: {e}")
+            with open(self.watermark_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def set_watermark(self, start_time, match_id):
+        tmp_path = self.watermark_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'start_time': start_time, 'id': match_id}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.watermark_path)
 
     def match_exists(self, match_id):
         """Checks if a match ID already exists in the database."""
-        return match_id in self.data["matches"]
+        return match_id in self.index or match_id in self._pending
 
     def add_match(self, match_data):
         """Adds or updates a match in the database."""
@@ -44,19 +265,83 @@ class StorageJson:
             print("Error: Match data missing ID")
             return
 
-        self.data["matches"][match_id] = match_data
-        self.save_data()
+        with self._lock:
+            self._pending[match_id] = match_data
+            self._pending.move_to_end(match_id)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+            elif self.flush_interval and time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
         print(f"Saved match {match_id}: {match_data.get('home', '?')} vs {match_data.get('away', '?')}")
 
+    def get_match(self, match_id):
+        """Reads one match record from disk, or None."""
+        with self._lock:
+            if match_id in self._pending:
+                return self._pending[match_id]
+            location = self.index.get(match_id)
+            if location is None:
+                return None
+            line = self._read_record(*location)
+        return json.loads(line)["match"]
+
     def get_all_matches(self):
         """Returns a list of all matches."""
-        return list(self.data["matches"].values())
+        with self._lock:
+            self.flush()
+            # Read in file order (sequential I/O)
+            locations = sorted(self.index.values())
+            matches = []
+            for offset, length in locations:
+                matches.append(json.loads(self._read_record(offset, length))["match"])
+        return matches
+
+    def compact(self):
+        """Rewrites the log with only the latest record per match (atomic rename)."""
+        with self._lock:
+            if self._pending:
+                self.flush()  # flush() compacts again if still needed
+                return
+            self._writer.flush()
+            live = [(match_id, self.get_match(match_id)) for match_id, _ in sorted(self.index.items(), key=lambda kv: kv[1])]
+            self._close_files()
+            self._write_log(self.log_path, live)
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)  # offsets changed; rebuilt by load_data
+            self.load_data()
+            self._open_files()
+        print(f"Compacted {self.log_path}: {len(self.index)} matches")
+
+    def _close_files(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._writer.close()
+        self._reader.close()
+
+    def close(self):
+        self._stop_flusher.set()
+        with self._lock:
+            if not self._writer.closed:
+                self.save_data()
+                if self.lazy:
+                    self._save_index()
+                self._close_files()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
 
     def get_stats_summary(self):
         """Returns stats about the database size."""
         return {
-            "total_matches": len(self.data["matches"]),
-            "filepath": self.filepath
+            "total_matches": len(self.index) + sum(1 for m in self._pending if m not in self.index),
+            "dead_records": self.dead_records,
+            "pending_writes": len(self._pending),
+            "batches_written": self.batches_written,
+            "filepath": self.log_path
         }
 
 if __name__ == "__main__":
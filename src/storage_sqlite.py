@@ -0,0 +1,261 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    id          TEXT PRIMARY KEY,
+    home        TEXT,
+    away        TEXT,
+    home_score  INTEGER,
+    away_score  INTEGER,
+    match_date  TEXT,      -- ISO 'YYYY-MM-DD HH:MM' parsed from start_time
+    start_time  TEXT,      -- raw Flashscore value
+    url         TEXT,
+    h2h         TEXT,      -- JSON
+    stats       TEXT,      -- JSON
+    player_stats TEXT,     -- JSON
+    extra       TEXT       -- JSON of any remaining fields
+);
+CREATE INDEX IF NOT EXISTS idx_matches_home_away ON matches(home, away);
+CREATE INDEX IF NOT EXISTS idx_matches_away ON matches(away);
+CREATE INDEX IF NOT EXISTS idx_matches_date ON matches(match_date);
+CREATE INDEX IF NOT EXISTS idx_matches_scores ON matches(home_score, away_score);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT             -- JSON
+);
+"""
+
+COLUMNS = ('id', 'home', 'away', 'home_score', 'away_score', 'match_date', 'start_time', 'url', 'h2h', 'stats', 'player_stats', 'extra')
+JSON_FIELDS = ('h2h', 'stats', 'player_stats')
+
+
+def parse_start_time(value):
+    """Flashscore shows '12.10.2024 02:00'; returns '2024-10-12 02:00' or None."""
+    if not value or value == 'N/A':
+        return None
+    for fmt in ("%d.%m.%Y %H:%M", "%d.%m.%Y"):
+        try:
+            return datetime.strptime(value.strip(), fmt).strftime("%Y-%m-%d %H:%M")
+        except ValueError:
+            continue
+    return None
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class StorageSqlite:
+    """
+    SQLite match database with the same interface as StorageJson.
+    Teams, date and scores are indexed columns; h2h/stats/player_stats are
+    stored as JSON text. Queries by team, date range and head-to-head use
+    the indexes instead of scanning every match.
+    Like StorageJson, add_match buffers writes (batch_size / flush_interval)
+    and durability maps to PRAGMA synchronous: 'fsync' FULL, 'flush' NORMAL, 'none' OFF.
+    """
+    SYNCHRONOUS = {'fsync': 'FULL', 'flush': 'NORMAL', 'none': 'OFF'}
+
+    def __init__(self, filepath="data/nhl_data.db", batch_size=1, flush_interval=None, durability='flush'):
+        if durability not in self.SYNCHRONOUS:
+            raise ValueError(f"durability must be one of {tuple(self.SYNCHRONOUS)}")
+        self.filepath = filepath
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = OrderedDict()
+        self._last_flush = time.monotonic()
+        directory = os.path.dirname(filepath)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(filepath, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={self.SYNCHRONOUS[durability]}")
+        self.conn.executescript(SCHEMA)
+
+    @staticmethod
+    def _to_row(match_data):
+        extra = {k: v for k, v in match_data.items() if k not in COLUMNS}
+        return (
+            match_data.get('id'),
+            match_data.get('home'),
+            match_data.get('away'),
+            _to_int(match_data.get('home_score')),
+            _to_int(match_data.get('away_score')),
+            parse_start_time(match_data.get('start_time')),
+            match_data.get('start_time'),
+            match_data.get('url'),
+            *(json.dumps(match_data.get(field), ensure_ascii=False) for field in JSON_FIELDS),
+            json.dumps(extra, ensure_ascii=False)
+        )
+
+    @staticmethod
+    def _from_row(row):
+        match = json.loads(row['extra']) if row['extra'] else {}
+        match.update({
+            'id': row['id'],
+            'home': row['home'],
+            'away': row['away'],
+            # Scores were strings in the scraped data; keep that shape
+            'home_score': str(row['home_score']) if row['home_score'] is not None else match.get('home_score', '?'),
+            'away_score': str(row['away_score']) if row['away_score'] is not None else match.get('away_score', '?'),
+            'start_time': row['start_time'],
+            'url': row['url'],
+        })
+        for field in JSON_FIELDS:
+            match[field] = json.loads(row[field]) if row[field] else None
+        return match
+
+    def _query(self, sql, params=()):
+        self.flush()
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [self._from_row(r) for r in rows]
+
+    def save_data(self):
+        """Writes pending matches and commits."""
+        self.flush()
+        with self._lock:
+            self.conn.commit()
+
+    def flush(self):
+        """Writes all buffered matches in one transaction."""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._pending:
+                return 0
+            batch = list(self._pending.values())
+            self._pending.clear()
+        return self.add_matches(batch)
+
+    def get_watermark(self):
+        """{'start_time': 'YYYY-MM-DD HH:MM', 'id': ...} of the newest fully collected match, or None."""
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'watermark'").fetchone()
+        return json.loads(row['value']) if row else None
+
+    def set_watermark(self, start_time, match_id):
+        value = json.dumps({'start_time': start_time, 'id': match_id}, ensure_ascii=False)
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('watermark', ?)", (value,))
+
+    def match_exists(self, match_id):
+        """Checks if a match ID already exists in the database."""
+        if match_id in self._pending:
+            return True
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM matches WHERE id = ?", (match_id,)).fetchone() is not None
+
+    def add_match(self, match_data):
+        """Adds or updates a match in the database."""
+        if not match_data.get('id'):
+            print("Error: Match data missing ID")
+            return
+        with self._lock:
+            self._pending[match_data['id']] = match_data
+            due = len(self._pending) >= self.batch_size or (
+                self.flush_interval and time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+        print(f"Saved match {match_data['id']}: {match_data.get('home', '?')} vs {match_data.get('away', '?')}")
+
+    def add_matches(self, matches):
+        """Inserts/updates a batch of matches in one transaction."""
+        rows = [self._to_row(m) for m in matches if m.get('id')]
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        with self._lock, self.conn:
+            self.conn.executemany(f"INSERT OR REPLACE INTO matches ({', '.join(COLUMNS)}) VALUES ({placeholders})", rows)
+        return len(rows)
+
+    def get_match(self, match_id):
+        matches = self._query("SELECT * FROM matches WHERE id = ?", (match_id,))
+        return matches[0] if matches else None
+
+    def get_all_matches(self):
+        """Returns a list of all matches."""
+        return self._query("SELECT * FROM matches ORDER BY match_date")
+
+    def get_matches_by_team(self, team, limit=None):
+        """All matches of a team, home or away, newest first."""
+        sql = ("SELECT * FROM (SELECT * FROM matches WHERE home = ? UNION ALL SELECT * FROM matches WHERE away = ?) "
+               "ORDER BY match_date DESC")
+        params = (team, team)
+        if limit:
+            sql += " LIMIT ?"
+            params += (limit,)
+        return self._query(sql, params)
+
+    def get_matches_by_date_range(self, start, end):
+        """Matches with start date in [start, end]; dates as 'YYYY-MM-DD'."""
+        return self._query(
+            "SELECT * FROM matches WHERE match_date >= ? AND match_date < date(?, '+1 day') ORDER BY match_date",
+            (start, end)
+        )
+
+    def get_head_to_head(self, team_a, team_b, limit=None):
+        """Meetings between two teams regardless of venue, newest first."""
+        sql = ("SELECT * FROM (SELECT * FROM matches WHERE home = ? AND away = ? "
+               "UNION ALL SELECT * FROM matches WHERE home = ? AND away = ?) ORDER BY match_date DESC")
+        params = (team_a, team_b, team_b, team_a)
+        if limit:
+            sql += " LIMIT ?"
+            params += (limit,)
+        return self._query(sql, params)
+
+    def get_stats_summary(self):
+        """Returns stats about the database size."""
+        self.flush()
+        with self._lock:
+            total = self.conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+        return {
+            "total_matches": total,
+            "filepath": self.filepath
+        }
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self.conn.commit()
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def migrate_from_json(json_path="data/nhl_data.json", db_path="data/nhl_data.db", batch_size=500):
+    """Copies every match from the JSON database (legacy file or JSONL log) into SQLite."""
+    from storage_json import StorageJson
+
+    source = StorageJson(filepath=json_path)
+    target = StorageSqlite(filepath=db_path)
+    matches = source.get_all_matches()
+    copied = 0
+    for i in range(0, len(matches), batch_size):
+        copied += target.add_matches(matches[i:i + batch_size])
+    source.close()
+    print(f"Migrated {copied} matches from {json_path} to {db_path} (total in DB: {target.get_stats_summary()['total_matches']})")
+    target.close()
+    return copied
+
+
+if __name__ == "__main__":
+    # python storage_sqlite.py migrate [data/nhl_data.json] [data/nhl_data.db]
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate":
+        migrate_from_json(*sys.argv[2:4])
+    else:
+        storage = StorageSqlite()
+        print(f"Database initialized. Matches found: {storage.get_stats_summary()['total_matches']}")
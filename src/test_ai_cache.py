@@ -0,0 +1,74 @@
+import os
+import tempfile
+import threading
+import time
+
+from ai_cache import AnalysisCache
+from ai_engine import SYSTEM_PROMPT, AIEngine
+
+PAYLOAD = {'home_team': "Boston Bruins", 'away_team': "New York Rangers"}
+
+
+def make_engine(cache, calls):
+    engine = AIEngine(cache=cache)
+    engine.api_key = "test"
+
+    def fake_stream(messages):
+        calls.append(1)
+        time.sleep(0.2)
+        yield "Прогноз: "
+        yield "П1"
+
+    engine._stream = fake_stream
+    return engine
+
+
+def test_concurrent_identical_streams_share_one_request():
+    cache = AnalysisCache()
+    calls = []
+    answers = []
+
+    def chat():
+        engine = make_engine(cache, calls)
+        answers.append("".join(engine.stream_analysis(PAYLOAD)))
+        assert engine.has_analysis()
+
+    threads = [threading.Thread(target=chat) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(calls) == 1
+    assert answers == ["Прогноз: П1"] * 3
+    assert cache.stats['collapsed'] == 2
+
+
+def test_abandoned_stream_releases_waiters():
+    cache = AnalysisCache()
+    engine = make_engine(cache, [])
+    stream = engine.stream_analysis(PAYLOAD)
+    next(stream)
+    stream.close()  # the chat went away mid-answer
+    assert not cache._pending
+    key = cache.make_key(engine.model, SYSTEM_PROMPT, engine._construct_prompt(PAYLOAD))
+    assert cache.get(key) is None
+
+
+def test_expired_disk_entries_are_swept():
+    disk_dir = tempfile.mkdtemp()
+    cache = AnalysisCache(ttl=60, disk_dir=disk_dir)
+    cache.put("yesterday", "old analysis")
+    old = time.time() - 120
+    os.utime(os.path.join(disk_dir, "yesterday.json"), (old, old))
+
+    cache.put("today", "new analysis")  # within sweep_interval: no sweep yet
+    assert len(os.listdir(disk_dir)) == 2
+    assert cache.sweep_disk() == 1
+    assert os.listdir(disk_dir) == ["today.json"]
+
+
+if __name__ == "__main__":
+    test_concurrent_identical_streams_share_one_request()
+    test_abandoned_stream_releases_waiters()
+    test_expired_disk_entries_are_swept()
+    print("OK")
@@ -0,0 +1,100 @@
+import os
+import tempfile
+
+from backfill import BackfillQueue, Progress, _run_round, enqueue_range
+
+
+class ListingParser:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def get_finished_matches(self, since=None, until=None, strict=False):
+        return self.rows
+
+
+class EmptyStorage:
+    def match_exists(self, match_id):
+        return False
+
+
+def new_queue(max_attempts=3):
+    return BackfillQueue(os.path.join(tempfile.mkdtemp(), "backfill.db"), max_attempts=max_attempts)
+
+
+def rows(*ids):
+    return [{'id': match_id, 'url': f"/match/{match_id}/"} for match_id in ids]
+
+
+def test_killed_run_costs_no_attempts():
+    work = new_queue()
+    try:
+        work.add(rows("g_4_a", "g_4_b"))
+        assert [m['id'] for m in work.claim_all()] == ["g_4_a", "g_4_b"]
+        assert work.counts()['in_progress'] == 2
+        # Killed twice before fetching anything
+        for _ in range(2):
+            assert work.recover() == 2
+            work.claim_all()
+        work.recover()
+        assert [attempts for _, attempts in work.conn.execute("SELECT id, attempts FROM jobs")] == [0, 0]
+    finally:
+        work.close()
+
+
+def test_fail_retries_until_max_attempts():
+    work = new_queue(max_attempts=2)
+    try:
+        work.add(rows("g_4_a"))
+        work.claim_all()
+        work.fail("g_4_a", "timeout")
+        assert work.counts()['pending'] == 1
+        work.claim_all()
+        work.fail("g_4_a", "timeout again")
+        assert work.counts()['failed'] == 1 and not work.claim_all()
+        assert work.failures() == [("g_4_a", 2, "timeout again")]
+    finally:
+        work.close()
+
+
+class StoredStorage(EmptyStorage):
+    """Every match is already stored (the run was killed after saving, before the ack)."""
+    saved = 0
+
+    def match_exists(self, match_id):
+        return True
+
+    def save_data(self):
+        self.saved += 1
+
+
+def test_stored_but_unacked_matches_are_marked_done():
+    work = new_queue()
+    try:
+        work.add(rows("g_4_a", "g_4_b"))
+        storage = StoredStorage()
+        _run_round(work.claim_all(), None, storage, work, workers=2, progress=Progress(2))
+        assert work.counts()['done'] == 2 and storage.saved == 1
+    finally:
+        work.close()
+
+
+def test_range_is_marked_listed_only_after_a_listing_with_rows():
+    work = BackfillQueue(os.path.join(tempfile.mkdtemp(), "backfill.db"))
+    try:
+        enqueue_range(work, ListingParser([]), EmptyStorage(), "2024-01-01", "2024-01-31")
+        assert work.get_meta("listed:2024-01-01:2024-01-31") is None
+
+        rows = [{'id': "g_4_Abc12345", 'url': "/match/Abc12345/"}]
+        enqueue_range(work, ListingParser(rows), EmptyStorage(), "2024-01-01", "2024-01-31")
+        assert work.get_meta("listed:2024-01-01:2024-01-31")
+        assert work.counts()['pending'] == 1
+    finally:
+        work.close()
+
+
+if __name__ == "__main__":
+    test_range_is_marked_listed_only_after_a_listing_with_rows()
+    test_killed_run_costs_no_attempts()
+    test_fail_retries_until_max_attempts()
+    test_stored_but_unacked_matches_are_marked_done()
+    print("OK")
@@ -0,0 +1,202 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import bot
+from schedule_cache import ScheduleCache
+from prewarm import AnalysisPrewarmer
+
+# Simulated latencies (seconds)
+NHL_DELAY = 0.05
+AI_DELAY = 0.5
+CHATS = 10
+
+GAME = {
+    'id': 2024020001,
+    'homeTeam': {'abbrev': 'NYR', 'name': {'default': 'New York Rangers'}},
+    'awayTeam': {'abbrev': 'BOS', 'name': {'default': 'Boston Bruins'}},
+    'startTimeUTC': '2024-10-12T23:00:00Z'
+}
+
+
+class FakeFetcher:
+    """Blocking stand-in for NHLAPIFetcher (uses time.sleep like real network I/O)."""
+
+    def get_games_for_date(self, date_str=None):
+        time.sleep(NHL_DELAY)
+        return [GAME]
+
+    def get_game_details(self, game_id, include_standings=False):
+        time.sleep(NHL_DELAY)
+        return {'boxscore': {}, 'matchup': {}}
+
+    def get_standings_snapshot(self):
+        return {'standings': {'standings': []}, 'by_abbrev': {}, 'fetched_at': 0}
+
+
+class FakeEngine:
+    """Blocking stand-in for AIEngine."""
+
+    def __init__(self):
+        self.conversation_history = []
+
+    def analyze_match(self, payload):
+        time.sleep(AI_DELAY)
+        self.conversation_history = [{"role": "assistant", "content": "ok"}]
+        return "ok"
+
+    def stream_analysis(self, payload):
+        for word in ("o", "k"):
+            time.sleep(AI_DELAY / 2)
+            yield word
+        self.conversation_history = [{"role": "assistant", "content": "ok"}]
+
+    def load_analysis(self, payload, analysis):
+        self.conversation_history = [{"role": "assistant", "content": analysis}]
+
+    def has_analysis(self):
+        return bool(self.conversation_history)
+
+    def ask_followup(self, question):
+        time.sleep(AI_DELAY)
+        return "ok"
+
+
+def make_update(chat_id):
+    async def noop(*args, **kwargs):
+        return None
+
+    query = SimpleNamespace(data=f"analyze_{GAME['id']}", answer=noop, edit_message_text=noop)
+    return SimpleNamespace(callback_query=query, effective_chat=SimpleNamespace(id=chat_id))
+
+
+def make_context(sent):
+    async def send_message(chat_id, text, **kwargs):
+        sent.append((chat_id, text))
+
+        async def edit_text(text, **kwargs):
+            sent.append((chat_id, text))
+
+        return SimpleNamespace(edit_text=edit_text)
+
+    return SimpleNamespace(bot=SimpleNamespace(send_message=send_message))
+
+
+async def measure_loop_lag(stop, lags, interval=0.01):
+    """Records how late the event loop wakes up; a blocked loop shows up as large lag."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run_load(chats):
+    sent = []
+    lags = []
+    stop = asyncio.Event()
+    bot.user_sessions.clear()
+    bot.fetcher = FakeFetcher()
+    bot.schedule_cache = ScheduleCache(bot.fetcher)
+    bot.prewarmer = AnalysisPrewarmer(bot.schedule_cache, bot.fetcher, engine_factory=FakeEngine)
+    for chat_id in range(chats):
+        bot.get_session(chat_id)['engine'] = FakeEngine()
+
+    monitor = asyncio.create_task(measure_loop_lag(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(bot.button_handler(make_update(c), make_context(sent)) for c in range(chats)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await monitor
+    return elapsed, max(lags) if lags else 0.0, sent
+
+
+def test_concurrent_chats_do_not_block_each_other():
+    elapsed, max_lag, sent = asyncio.run(run_load(CHATS))
+    serial = CHATS * (AI_DELAY + 2 * NHL_DELAY)
+    print(f"{CHATS} chats analysed in {elapsed:.2f}s (serial would be {serial:.2f}s), max loop lag {max_lag * 1000:.1f}ms")
+
+    # Every chat got its analysis
+    analysed = {chat_id for chat_id, text in sent if text == "ok"}
+    assert analysed == set(range(CHATS))
+    # AI pool runs ai_workers analyses at once: no head-of-line blocking
+    workers = bot.service.ai_executor._max_workers
+    assert elapsed < (CHATS / workers + 1) * (AI_DELAY + 2 * NHL_DELAY)
+    assert elapsed < serial / 2
+    # The event loop itself stayed responsive throughout
+    assert max_lag < AI_DELAY / 2
+
+
+def test_prewarmed_game_answers_without_ai_call():
+    async def scenario():
+        bot.user_sessions.clear()
+        bot.fetcher = FakeFetcher()
+        bot.schedule_cache = ScheduleCache(bot.fetcher)
+        bot.prewarmer = AnalysisPrewarmer(bot.schedule_cache, bot.fetcher, engine_factory=FakeEngine)
+        await asyncio.to_thread(bot.prewarmer.run_once)
+        
+        engine = bot.get_session(1)['engine'] = FakeEngine()
+        sent = []
+        start = time.perf_counter()
+        await bot.button_handler(make_update(1), make_context(sent))
+        return time.perf_counter() - start, sent, engine
+
+    elapsed, sent, engine = asyncio.run(scenario())
+    print(f"Pre-warmed analysis delivered in {elapsed * 1000:.1f}ms")
+    assert "ok" in [text for _, text in sent]
+    assert engine.has_analysis()
+    assert elapsed < AI_DELAY / 5
+
+
+class FailingEngine(FakeEngine):
+    def stream_analysis(self, payload):
+        yield "o"
+        raise RuntimeError("DeepSeek недоступен")
+
+
+def test_failed_analysis_is_reported_to_the_chat():
+    async def scenario():
+        bot.user_sessions.clear()
+        bot.fetcher = FakeFetcher()
+        bot.schedule_cache = ScheduleCache(bot.fetcher)
+        bot.prewarmer = AnalysisPrewarmer(bot.schedule_cache, bot.fetcher, engine_factory=FakeEngine)
+        bot.get_session(1)['engine'] = FailingEngine()
+        sent = []
+        await bot.button_handler(make_update(1), make_context(sent))
+        return sent
+
+    sent = asyncio.run(scenario())
+    assert (1, "⚠️ Ошибка получения ответа: DeepSeek недоступен") in sent
+    assert not bot.get_session(1)['lock'].locked()
+
+
+def test_abandoned_stream_stops_the_generator():
+    produced = []
+    closed = threading.Event()
+
+    def words():
+        try:
+            for i in range(20):
+                time.sleep(0.02)
+                produced.append(i)
+                yield str(i)
+        finally:
+            closed.set()
+
+    async def scenario():
+        stream = bot.service.stream(words)
+        async for word in stream:
+            break  # the chat went away after the first chunk
+        await stream.aclose()
+        # The loop keeps running: only the stop flag can end the producer early
+        assert await asyncio.to_thread(closed.wait, 1)
+
+    asyncio.run(scenario())
+    assert len(produced) < 5
+
+
+if __name__ == "__main__":
+    test_concurrent_chats_do_not_block_each_other()
+    test_prewarmed_game_answers_without_ai_call()
+    test_failed_analysis_is_reported_to_the_chat()
+    test_abandoned_stream_stops_the_generator()
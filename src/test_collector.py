@@ -0,0 +1,71 @@
+from collector import find_new_matches
+
+
+class ResultsParser:
+    """Results list of fixed rows; applies `stop` like parse_results_html."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def get_finished_matches(self, since=None, stop=None, until=None, strict=False, load_until=None):
+        self.calls.append({'since': since, 'load_until': load_until})
+        found = []
+        for row in self.rows:
+            if stop and stop(row):
+                break
+            found.append(row)
+        return found
+
+
+class WatermarkStorage:
+    def __init__(self, watermark, stored=None):
+        self.watermark = watermark
+        # match id -> start time
+        self.stored = {match_id: {'id': match_id, 'start_time': start_time}
+                       for match_id, start_time in (stored or {}).items()}
+
+    def get_watermark(self):
+        return self.watermark
+
+    def set_watermark(self, start_time, match_id):
+        self.watermark = {'start_time': start_time, 'id': match_id}
+
+    def match_exists(self, match_id):
+        return match_id in self.stored
+
+    def get_match(self, match_id):
+        return self.stored.get(match_id)
+
+    def save_data(self):
+        pass
+
+
+def row(match_id, time):
+    return {'id': match_id, 'time': time, 'home_score': 2, 'away_score': 1, 'url': f"/match/{match_id}/"}
+
+
+def test_results_are_loaded_down_to_the_watermark():
+    storage = WatermarkStorage({'start_time': "2024-10-12 02:00", 'id': "g_1"}, stored={"g_1": "12.10.2024 02:00"})
+    parser = ResultsParser([row("g_3", "14.10.2024 02:00"), row("g_2", "13.10.2024 02:00"),
+                            row("g_1", "12.10.2024 02:00"), row("g_0", "11.10.2024 02:00")])
+    new_matches, complete = find_new_matches(parser, storage)
+    assert parser.calls == [{'since': None, 'load_until': "2024-10-12"}]
+    assert [m['id'] for m in new_matches] == ["g_3", "g_2"]
+    assert complete
+
+
+def test_list_that_stops_short_of_the_watermark_is_incomplete():
+    storage = WatermarkStorage({'start_time': "2024-10-12 02:00", 'id': "g_1"}, stored={"g_3": "14.10.2024 02:00", "g_2": "13.10.2024 02:00"})
+    # The results page ends before the watermark row: matches in between may be missing
+    parser = ResultsParser([row("g_3", "14.10.2024 02:00"), row("g_2", "13.10.2024 02:00")])
+    new_matches, complete = find_new_matches(parser, storage)
+    assert new_matches == [] and not complete
+    # Everything listed is stored, but the watermark must not jump over the gap
+    assert storage.watermark == {'start_time': "2024-10-12 02:00", 'id': "g_1"}
+
+
+if __name__ == "__main__":
+    test_results_are_loaded_down_to_the_watermark()
+    test_list_that_stops_short_of_the_watermark_is_incomplete()
+    print("OK")
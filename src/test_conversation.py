@@ -0,0 +1,66 @@
+from conversation import ConversationHistory, count_message_tokens
+
+PINNED = [
+    {'role': "system", 'content': "Ты хоккейный аналитик."},
+    {'role': "user", 'content': "Проанализируй матч Рейнджерс - Бостон."},
+    {'role': "assistant", 'content': "Анализ матча. " * 20}
+]
+
+
+def turn(i, size=60):
+    return [{'role': "user", 'content': f"Вопрос {i}: " + "а" * size},
+            {'role': "assistant", 'content': f"Ответ {i}: " + "б" * size}]
+
+
+def chat(turns, max_tokens):
+    history = ConversationHistory(PINNED, max_tokens=max_tokens)
+    for i in range(turns):
+        for message in turn(i):
+            history.append(message)
+    return history
+
+
+def test_budget_keeps_pinned_and_drops_whole_turns():
+    history = chat(10, max_tokens=count_message_tokens(PINNED) + 400)
+    assert history.token_count() <= history.max_tokens
+    assert history.messages[:3] == PINNED
+    assert history.dropped_turns > 0
+    # Every question left still has its answer right after it
+    recent = history.messages[3:]
+    assert [m['role'] for m in recent] == ["user", "assistant"] * (len(recent) // 2)
+    assert recent[-1]['content'].startswith("Ответ 9")
+    # Dropped questions survive as a note after the pinned turns
+    sent = history.to_messages()
+    assert sent[3]['role'] == "system" and "Вопрос 0" in sent[3]['content']
+
+
+def test_summary_is_trimmed_to_the_newest_questions():
+    history = ConversationHistory(summary_chars=100)
+    for i in range(10):
+        history._remember(f"Вопрос {i}:   " + "в" * 100)
+    assert len(history.summary) == 100
+    assert history.summary.startswith("...")
+    assert "Вопрос 9" in history.summary and "Вопрос 0" not in history.summary
+
+
+def test_round_trip_keeps_summary_within_budget():
+    max_tokens = count_message_tokens(PINNED) + 400
+    history = chat(10, max_tokens=max_tokens)
+    restored = ConversationHistory.from_dict(history.to_dict(), max_tokens=max_tokens)
+    assert restored.to_messages() == history.to_messages()
+    assert restored.dropped_turns == history.dropped_turns
+
+    # A smaller budget after restore is met with the summary counted
+    restored = ConversationHistory.from_dict(history.to_dict(), max_tokens=max_tokens - 100)
+    assert restored.token_count() <= restored.max_tokens
+    assert restored.dropped_turns > history.dropped_turns
+    # Turns dropped on restore are added to the stored summary, not lost
+    oldest_kept = history.messages[3]['content'].split(":")[0]
+    assert oldest_kept in restored.summary
+
+
+if __name__ == "__main__":
+    test_budget_keeps_pinned_and_drops_whole_turns()
+    test_summary_is_trimmed_to_the_newest_questions()
+    test_round_trip_keeps_summary_within_budget()
+    print("OK")
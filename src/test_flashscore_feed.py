@@ -0,0 +1,141 @@
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from data_fetcher import FlashscoreParser, reaches_back
+from flashscore_feed import FeedError, FlashscoreFeedClient, parse_feed
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "flashscore")
+FSIGN = "SW9D1eZo"
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Stand-in for Flashscore: serves the results page and feed responses from fixtures/flashscore."""
+
+    def do_GET(self):
+        if self.path == "/hockey/usa/nhl/results/":
+            name = "results.html"
+        elif self.path.startswith("/x/feed/") and self.headers.get("x-fsign") == FSIGN:
+            name = self.path[len("/x/feed/"):]
+        else:
+            name = None
+        path = os.path.join(FIXTURES, name) if name and "/" not in name else None
+        if not path or not os.path.exists(path):
+            self.send_response(404)
+            self.end_headers()
+            return
+        with open(path, 'rb') as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_fixtures():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, FlashscoreFeedClient(site_url=f"http://127.0.0.1:{server.server_port}", timeout=5)
+
+
+def test_parse_feed():
+    assert parse_feed("SA÷4¬~AA÷x1¬AE÷Бостон¬~") == [{'SA': '4'}, {'AA': 'x1', 'AE': 'Бостон'}]
+
+
+def test_finished_matches_and_details_match_browser_shape():
+    server, client = serve_fixtures()
+    try:
+        matches = client.get_finished_matches()
+        assert re.match(r"\d{2}\.\d{2}\.\d{4} \d{2}:\d{2}$", matches[0].pop('time'))
+        assert matches[0] == {
+            'home': 'Бостон', 'away': 'Рейнджерс', 'home_score': '3', 'away_score': '2',
+            'id': 'g_4_Abc12345', 'url': '/match/hockey/boston-bruins/new-york-rangers/?mid=Abc12345'
+        }
+        assert matches[1]['url'] == '/match/Def67890/'
+
+        details = client.get_match_details(matches[0]['url'])
+        assert set(details) == {'url', 'start_time', 'h2h', 'stats', 'player_stats'}
+        assert re.match(r"\d{2}\.\d{2}\.\d{4} \d{2}:\d{2}$", details['start_time'])
+        assert set(details['h2h']) == {'home_last5', 'away_last5', 'head_to_head', 'all_matches'}
+        assert len(details['h2h']['home_last5']) == 2 and len(details['h2h']['head_to_head']) == 1
+        assert details['stats']['shots_on_goal'] == {'home': '31', 'away': '27'}
+        assert details['stats']['faceoffs_won'] == {'home': '30', 'away': '26'}
+        assert len(details['stats']['raw']) == 7  # first period not mixed in
+        assert [p['name'] for p in details['player_stats']['skaters']] == ['Пастрняк Д.', 'Панарин А.']
+        assert details['player_stats']['goalies'][0]['savePercent'] == '92.59%'
+
+        # No feeds for the second match
+        try:
+            client.get_match_details(matches[1]['url'])
+            assert False, "expected FeedError"
+        except FeedError:
+            pass
+    finally:
+        server.shutdown()
+        client.close()
+
+
+class FakeDriver:
+    """Minimal WebDriver: every element is present, scripts return nothing."""
+    title = "Хоккей: НХЛ"
+
+    def __init__(self):
+        self.visited = []
+
+    def get(self, url):
+        self.visited.append(url)
+
+    def find_element(self, by, value):
+        return type("Element", (), {'text': "12.10.2024 02:00"})()
+
+    def execute_script(self, script, *args):
+        return {}
+
+    def quit(self):
+        pass
+
+
+def test_parser_falls_back_to_browser_when_feed_fails():
+    server, client = serve_fixtures()
+    parser = FlashscoreParser(feed=client)
+    drivers = []
+
+    def start_browser():
+        parser.browser.driver = FakeDriver()
+        drivers.append(parser.browser.driver)
+        return parser.browser.driver
+
+    parser.browser.start = start_browser
+    try:
+        details = parser.get_match_details('/match/hockey/boston-bruins/new-york-rangers/?mid=Abc12345')
+        assert details['stats']['shots_on_goal'] == {'home': '31', 'away': '27'}
+        assert not drivers  # served without a browser
+
+        # The feed has nothing for this match -> the browser path runs
+        details = parser.get_match_details('/match/Def67890/')
+        assert len(drivers) == 1 and parser.page_loads == 1
+        assert drivers[0].visited == ['https://www.flashscorekz.com/match/Def67890#/h2h']
+        assert set(details) == {'url', 'start_time', 'h2h', 'stats', 'player_stats'}
+    finally:
+        server.shutdown()
+        client.close()
+
+
+def test_feed_rows_must_reach_back_to_since():
+    rows = [{'time': "13.10.2024 00:00"}, {'time': "12.10.2024 00:00"}, {'time': "N/A"}]
+    assert reaches_back(rows, "2024-10-13")
+    # Rows of the 12th may continue on the next page: the browser has to load them
+    assert not reaches_back(rows, "2024-10-12")
+    assert not reaches_back([], "2024-10-12")
+
+
+if __name__ == "__main__":
+    test_parse_feed()
+    test_finished_matches_and_details_match_browser_shape()
+    test_parser_falls_back_to_browser_when_feed_fails()
+    test_feed_rows_must_reach_back_to_since()
+    print("OK")
@@ -0,0 +1,37 @@
+import requests
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from rate_limit import AdaptiveRateLimiter
+from scrape_errors import BLOCKED, BROWSER_CRASH, CONNECTION, EMPTY, TIMEOUT, ScrapeError, classify
+
+
+def test_classify():
+    assert classify(TimeoutException()) == TIMEOUT
+    assert classify(WebDriverException("unknown error: net::ERR_CONNECTION_RESET")) == CONNECTION
+    assert classify(WebDriverException("chrome not reachable")) == BROWSER_CRASH
+    assert classify(requests.ConnectTimeout()) == TIMEOUT
+    assert classify(requests.ConnectionError()) == CONNECTION
+    assert classify(ScrapeError("captcha", BLOCKED)) == BLOCKED
+    # A message that merely mentions a timeout is not one
+    assert classify(ValueError("timeout")) == 'other'
+
+
+def test_adaptive_rate():
+    limiter = AdaptiveRateLimiter(rate=0.5, min_rate=0.1, max_rate=1.0, increase=0.2, cooldown=30)
+    for _ in range(5):
+        limiter.on_success()
+    assert limiter.rate == 1.0  # capped at the ceiling
+    limiter.on_error(EMPTY)
+    assert limiter.rate == 0.5
+    limiter.on_error(BROWSER_CRASH)  # not the site's fault
+    assert limiter.rate == 0.5
+    limiter.on_error(BLOCKED)
+    assert limiter.rate == 0.1 and limiter.stats['pauses'] == 1
+    # Everyone waits out the cooldown before the next request
+    assert limiter._take(limiter._paused_until - 10) >= 10
+
+
+if __name__ == "__main__":
+    test_classify()
+    test_adaptive_rate()
+    print("OK")
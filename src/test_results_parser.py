@@ -0,0 +1,34 @@
+import os
+
+from results_parser import BACKENDS, parse_results_html
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "flashscore", "results_page.html")
+
+
+def load_fixture():
+    with open(FIXTURE, encoding='utf-8') as f:
+        return f.read()
+
+
+def test_backends_match_reference_parser():
+    page = load_fixture()
+    reference = parse_results_html(page, backend='bs4')
+    assert len(reference) == 40
+    for name in BACKENDS:
+        assert parse_results_html(page, backend=name) == reference, name
+
+
+def test_row_fields():
+    matches = parse_results_html(load_fixture())
+    first = matches[0]
+    assert first['id'].startswith("g_4_") and first['url'].endswith("?mid=" + first['id'][4:])
+    assert first['home'] and first['away'] and first['home_score'].isdigit()
+    # Score cells rendered as divs and rows without a score
+    assert matches[4]['home_score'].isdigit()
+    assert matches[17]['home_score'] == matches[17]['away_score'] == "?"
+
+
+if __name__ == "__main__":
+    test_backends_match_reference_parser()
+    test_row_fields()
+    print("OK")
@@ -0,0 +1,92 @@
+import os
+import tempfile
+import threading
+import time
+
+from sessions import SessionStore
+
+
+class Engine:
+    def __init__(self):
+        self.conversation_history = None
+
+    def export_history(self):
+        return self.conversation_history
+
+    def restore_history(self, state):
+        self.conversation_history = state
+
+
+def test_spill_files_of_chats_that_never_return_expire():
+    spill_dir = tempfile.mkdtemp()
+    store = SessionStore(lambda: {'engine': Engine()}, idle_ttl=0, spill_dir=spill_dir, spill_ttl=60)
+    store.get(1)['engine'].conversation_history = [{'role': "user", 'content': "вопрос"}]
+    store.get(2)['engine'].conversation_history = [{'role': "user", 'content': "вопрос"}]
+    time.sleep(0.01)
+    store.evict_idle()
+    assert sorted(os.listdir(spill_dir)) == ["1.json", "2.json"]
+
+    old = time.time() - 120
+    os.utime(os.path.join(spill_dir, "1.json"), (old, old))
+    store.evict_idle()
+    assert os.listdir(spill_dir) == ["2.json"]
+    assert store.gauges()['spills_expired_total'] == 1
+    # The chat that comes back in time continues its conversation
+    assert store.get(2)['engine'].conversation_history[0]['content'] == "вопрос"
+
+
+def test_idle_sessions_are_evicted():
+    store = SessionStore(lambda: {'engine': Engine()}, idle_ttl=0.05)
+    store.get(1)
+    time.sleep(0.1)
+    store.get(2)
+    assert store.evict_idle() == 1
+    assert 1 not in store and 2 in store
+    assert store.gauges()['evicted_total'] == 1
+
+
+def test_cap_evicts_least_recently_used():
+    store = SessionStore(lambda: {'engine': Engine()}, max_entries=2)
+    store.get(1)
+    store.get(2)
+    store.get(1)  # 2 is now the least recently used
+    store.get(3)
+    assert 1 in store and 3 in store and 2 not in store
+    assert len(store) == 2
+
+
+def test_session_with_a_running_call_is_not_evicted():
+    store = SessionStore(lambda: {'engine': Engine(), 'lock': threading.Lock()}, idle_ttl=0, max_entries=1)
+    busy = store.get(1)
+    busy['lock'].acquire()  # an AI call is running for chat 1
+    store.get(2)
+    assert 1 in store
+    time.sleep(0.01)
+    assert store.evict_idle() == 1
+    assert 1 in store and 2 not in store
+    busy['lock'].release()
+    store.evict_idle()
+    assert 1 not in store
+
+
+def test_evicted_chat_is_restored_from_spill():
+    spill_dir = tempfile.mkdtemp()
+    store = SessionStore(lambda: {'engine': Engine()}, max_entries=1, spill_dir=spill_dir)
+    store.get(1)['engine'].conversation_history = [{'role': "assistant", 'content': "анализ"}]
+    store.get(2)  # pushes chat 1 out to disk
+    assert 1 not in store
+    assert os.listdir(spill_dir) == ["1.json"]
+
+    history = store.get(1)['engine'].conversation_history
+    assert history == [{'role': "assistant", 'content': "анализ"}]
+    assert store.gauges()['restored_total'] == 1
+    assert not os.path.exists(os.path.join(spill_dir, "1.json"))
+
+
+if __name__ == "__main__":
+    test_spill_files_of_chats_that_never_return_expire()
+    test_idle_sessions_are_evicted()
+    test_cap_evicts_least_recently_used()
+    test_session_with_a_running_call_is_not_evicted()
+    test_evicted_chat_is_restored_from_spill()
+    print("OK")
@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+
+from storage_json import StorageJson
+from storage_sqlite import StorageSqlite
+
+
+def match(match_id, home="Бостон"):
+    return {'id': match_id, 'home': home, 'away': "Рейнджерс", 'start_time': "12.10.2024 02:00"}
+
+
+def temp_db(name="nhl_data.json"):
+    return os.path.join(tempfile.mkdtemp(), name)
+
+
+def test_json_corrupt_line_keeps_later_records():
+    path = temp_db()
+    with StorageJson(path) as storage:
+        for i in range(3):
+            storage.add_match(match(f"g_4_{i}"))
+        log_path = storage.log_path
+    with open(log_path, 'rb') as f:
+        lines = f.read().splitlines(keepends=True)
+    lines[1] = b'{"id": \x00\x00\x00\n'  # e.g. a block lost in an OS crash
+    with open(log_path, 'wb') as f:
+        f.write(b"".join(lines) + b'{"id": "g_4_torn", "ma')
+
+    for lazy in (False, True, True):
+        with StorageJson(path, lazy=lazy) as storage:
+            assert sorted(storage.index) == ["g_4_0", "g_4_2"]
+            assert storage.get_match("g_4_2") == match("g_4_2")
+            assert storage.dead_records == 1
+    with open(log_path, 'rb') as f:
+        assert f.read().endswith(b"\n")  # only the torn tail was cut off
+
+
+def test_json_buffered_writes_are_readable_and_flushed_on_close():
+    path = temp_db()
+    with StorageJson(path, batch_size=10, durability='fsync') as storage:
+        for i in range(3):
+            storage.add_match(match(f"g_4_{i}"))
+        assert storage.match_exists("g_4_1") and storage.get_match("g_4_2") == match("g_4_2")
+        assert os.path.getsize(storage.log_path) == 0  # still in the write-behind buffer
+    with StorageJson(path) as storage:
+        assert [m['id'] for m in storage.get_all_matches()] == ["g_4_0", "g_4_1", "g_4_2"]
+
+
+def test_json_compaction_survives_reopen():
+    path = temp_db()
+    with StorageJson(path, compact_min=2, compact_ratio=0.5) as storage:
+        for version in range(4):
+            for i in range(2):
+                storage.add_match(match(f"g_4_{i}", home=f"v{version}"))
+        log_path = storage.log_path
+    with open(log_path, 'rb') as f:
+        assert len(f.read().splitlines()) < 8  # overwritten records were dropped
+    for lazy in (False, True):
+        with StorageJson(path, lazy=lazy) as storage:
+            assert storage.get_match("g_4_0")['home'] == "v3" and storage.get_match("g_4_1")['home'] == "v3"
+
+
+def test_json_stale_lazy_sidecar():
+    path = temp_db()
+    with StorageJson(path, lazy=True) as storage:
+        storage.add_match(match("g_4_0"))
+        index_path = storage.index_path
+    # Appended by a non-lazy writer: the sidecar does not cover these records
+    with StorageJson(path) as storage:
+        storage.add_match(match("g_4_1"))
+        storage.add_match(match("g_4_0", home="v2"))
+    with StorageJson(path, lazy=True) as storage:
+        assert storage.get_match("g_4_1") == match("g_4_1") and storage.get_match("g_4_0")['home'] == "v2"
+
+    # A sidecar from before a rewrite of the log points at the wrong offsets
+    stale = index_path + ".old"
+    shutil.copy(index_path, stale)
+    with StorageJson(path) as storage:
+        storage.compact()
+    shutil.copy(stale, index_path)
+    with StorageJson(path, lazy=True) as storage:
+        assert sorted(storage.index) == ["g_4_0", "g_4_1"]
+        assert storage.get_match("g_4_0")['home'] == "v2"
+
+
+def test_sqlite_buffered_writes_and_close():
+    path = temp_db("nhl_data.db")
+    with StorageSqlite(path, batch_size=10) as storage:
+        storage.add_match(match("g_4_0"))
+        storage.add_match(match("g_4_1"))
+        assert storage.match_exists("g_4_1")
+        assert storage.get_match("g_4_0")['home'] == "Бостон"  # reads flush the buffer
+        storage.add_match(match("g_4_2"))
+        storage.set_watermark("2024-10-12 02:00", "g_4_2")
+    with StorageSqlite(path) as storage:
+        assert [m['id'] for m in storage.get_all_matches()] == ["g_4_0", "g_4_1", "g_4_2"]
+        assert storage.get_watermark() == {'start_time': "2024-10-12 02:00", 'id': "g_4_2"}
+        assert len(storage.get_head_to_head("Рейнджерс", "Бостон")) == 3
+
+
+if __name__ == "__main__":
+    test_json_corrupt_line_keeps_later_records()
+    test_json_buffered_writes_are_readable_and_flushed_on_close()
+    test_json_compaction_survives_reopen()
+    test_json_stale_lazy_sidecar()
+    test_sqlite_buffered_writes_and_close()
+    print("OK")
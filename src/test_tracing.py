@@ -0,0 +1,69 @@
+import asyncio
+import json
+import os
+import tempfile
+import urllib.request
+
+from async_service import AsyncAnalysisService
+from tracing import Tracer, tags, traced, tracer
+
+
+def test_disabled_records_nothing():
+    off = Tracer()
+    with off.span("stage"):
+        pass
+    assert off.summary() == {}
+
+
+def test_tags_follow_pool_calls_into_jsonl():
+    path = os.path.join(tempfile.mkdtemp(), "trace.jsonl")
+    tracer.configure(jsonl_path=path)
+    service = AsyncAnalysisService(io_workers=1, ai_workers=1)
+
+    @traced("lookup")
+    def lookup(game_id):
+        return game_id
+
+    async def handler():
+        with tags(game_id="2024020001", chat=42):
+            return await service._run(service.io_executor, lookup, "2024020001")
+
+    try:
+        assert asyncio.run(handler()) == "2024020001"
+        try:
+            with tracer.span("failing"):
+                raise ValueError("boom")
+        except ValueError:
+            pass
+    finally:
+        tracer.close()
+        service.shutdown()
+    with open(path, encoding="utf-8") as f:
+        events = [json.loads(line) for line in f]
+    assert events[0]['stage'] == "lookup" and events[0]['game_id'] == "2024020001" and events[0]['chat'] == 42
+    assert events[1] == {**events[1], 'stage': "failing", 'error': "ValueError"}
+
+
+def test_prometheus_endpoint():
+    metrics = Tracer()
+    metrics.configure(port=0)
+    port = metrics.port
+    metrics.record("deepseek", 3.2)
+    metrics.record("deepseek", 0.2, error="Timeout")
+    metrics.register_gauges("sessions", lambda: {'live_sessions': 3, 'evicted_total': 7})
+    try:
+        text = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode()
+    finally:
+        metrics.close()
+    assert 'nhl_stage_seconds_bucket{stage="deepseek",le="0.25"} 1' in text
+    assert 'nhl_stage_seconds_bucket{stage="deepseek",le="5"} 2' in text
+    assert 'nhl_stage_seconds_count{stage="deepseek"} 2' in text
+    assert 'nhl_stage_errors_total{stage="deepseek"} 1' in text
+    assert "nhl_sessions_live_sessions 3" in text and "# TYPE nhl_sessions_evicted_total counter" in text
+
+
+if __name__ == "__main__":
+    test_disabled_records_nothing()
+    test_tags_follow_pool_calls_into_jsonl()
+    test_prometheus_endpoint()
+    print("OK")
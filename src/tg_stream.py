@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import time
+
+from telegram import constants
+from telegram.error import BadRequest, RetryAfter
+
+from tracing import tracer
+
+MAX_TEXT_LENGTH = constants.MessageLimit.MAX_TEXT_LENGTH
+
+
+class StreamingMessage:
+    """
+    A Telegram message that grows while the AI answer streams in.
+    Edits are rate limited (Telegram allows roughly one edit per second per chat)
+    and back off on RetryAfter; partial text is sent as plain text and only the
+    final edit uses Markdown, since half-written Markdown fails to parse.
+    Answers longer than one message continue in a new message.
+    """
+
+    def __init__(self, bot, chat_id, placeholder="🧠 DeepSeek анализирует матч...", min_interval=1.0):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.placeholder = placeholder
+        self.min_interval = min_interval
+        self.message = None
+        self.text = ""          # full answer so far
+        self._offset = 0        # where the current Telegram message starts in self.text
+        self._shown = ""        # what the current message currently displays
+        self._next_edit = 0.0
+        self.edits = 0
+
+    async def start(self):
+        with tracer.span("telegram_send"):
+            self.message = await self.bot.send_message(chat_id=self.chat_id, text=self.placeholder)
+        self._next_edit = time.monotonic() + self.min_interval
+
+    async def append(self, chunk):
+        self.text += chunk
+        # Current message is full: freeze it and continue in a fresh one
+        while len(self.text) - self._offset > MAX_TEXT_LENGTH:
+            split = self._split_point()
+            await self._edit(self.text[self._offset:split], force=True)
+            self._offset = split
+            with tracer.span("telegram_send"):
+                self.message = await self.bot.send_message(chat_id=self.chat_id, text="…")
+            self._shown = ""
+        if time.monotonic() >= self._next_edit:
+            await self._edit(self.text[self._offset:] + " ▌")
+
+    async def finish(self):
+        """Final edit with Markdown, falling back to plain text if it does not parse."""
+        final = self.text[self._offset:] or self.placeholder
+        try:
+            await self._edit(final, force=True, parse_mode=constants.ParseMode.MARKDOWN)
+        except BadRequest:
+            await self._edit(final, force=True)
+        return self.text
+
+    def _split_point(self):
+        end = self._offset + MAX_TEXT_LENGTH
+        newline = self.text.rfind("\n", self._offset, end)
+        return newline if newline > self._offset else end
+
+    async def _edit(self, text, force=False, parse_mode=None):
+        if text == self._shown and parse_mode is None:
+            return
+        if not force and time.monotonic() < self._next_edit:
+            return
+        try:
+            with tracer.span("telegram_edit"):
+                await self.message.edit_text(text, parse_mode=parse_mode)
+            self._shown = text
+            self.edits += 1
+            self._next_edit = time.monotonic() + self.min_interval
+        except RetryAfter as e:
+            delay = e.retry_after
+            delay = delay.total_seconds() if hasattr(delay, 'total_seconds') else delay
+            logging.warning(f"Telegram flood limit, pausing edits for {delay}s")
+            self._next_edit = time.monotonic() + delay
+            if force:
+                time_left = self._next_edit - time.monotonic()
+                if time_left > 0:
+                    await asyncio.sleep(time_left)
+                await self._edit(text, force=True, parse_mode=parse_mode)
+        except BadRequest as e:
+            if "not modified" in str(e).lower():
+                return
+            if parse_mode:
+                raise
+            logging.error(f"Stream edit error: {e}")
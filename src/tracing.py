@@ -0,0 +1,241 @@
+"""
+Per-stage timings of the analysis pipeline.
+
+    with tracer.span("get_standings"):
+        ...
+
+    @traced("get_games_for_date")
+    def get_games_for_date(...): ...
+
+Each finished span goes into a histogram per stage (served in Prometheus
+text format on 127.0.0.1:NHL_METRICS_PORT/metrics) and, with
+NHL_TRACE_FILE set, is appended to a JSONL file together with its tags.
+Tags (game_id, chat) are set once per request with `with tags(...)` and
+follow the request into the thread pools (see AsyncAnalysisService._run).
+They only go to the JSONL file: as Prometheus labels every chat would be a
+new series. Disabled (the default) a span is one flag check.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds of the histogram buckets, seconds
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+_tags = contextvars.ContextVar('trace_tags', default={})
+
+
+@contextmanager
+def tags(**values):
+    """Tags every span in this block (and in pool calls started from it)."""
+    token = _tags.set({**_tags.get(), **values})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.errors = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds, ok):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.errors += 0 if ok else 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+
+class _Span:
+    """A started span; finish() records it (once)."""
+
+    def __init__(self, tracer, stage, extra):
+        self.tracer = tracer
+        self.stage = stage
+        self.tags = {**_tags.get(), **extra}
+        self.started = time.perf_counter()
+        self.done = False
+
+    def finish(self, error=None):
+        if not self.done:
+            self.done = True
+            self.tracer.record(self.stage, time.perf_counter() - self.started, self.tags, error)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish(exc_type.__name__ if exc_type else None)
+        return False
+
+
+class _NoSpan:
+    def finish(self, error=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Tracer:
+    """Histograms per stage plus an optional JSONL log of every span. Thread-safe."""
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._jsonl = None
+        self._server = None
+        self._gauges = {}  # prefix -> function returning {name: number}
+        self.port = None
+
+    def configure(self, port=None, jsonl_path=None):
+        """Enables tracing: Prometheus endpoint on `port` (0: any free port) and/or JSONL output."""
+        if jsonl_path:
+            directory = os.path.dirname(jsonl_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            self._jsonl = open(jsonl_path, "a", encoding="utf-8", buffering=1)
+        if port is not None:
+            self._server = ThreadingHTTPServer(("127.0.0.1", port), _handler(self))
+            self.port = self._server.server_port
+            threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+            logging.info(f"Metrics on http://127.0.0.1:{self.port}/metrics")
+        self.enabled = port is not None or bool(jsonl_path)
+
+    def configure_from_env(self):
+        port = os.getenv("NHL_METRICS_PORT")
+        self.configure(port=int(port) if port else None, jsonl_path=os.getenv("NHL_TRACE_FILE"))
+
+    def register_gauges(self, prefix, read):
+        """Publishes read() -> {name: number} as nhl_<prefix>_<name> on /metrics (read at scrape time)."""
+        self._gauges[prefix] = read
+
+    def span(self, stage, **extra):
+        """Context manager timing `stage`; also start()/finish() for spans that cross a generator."""
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, stage, extra)
+
+    start = span
+
+    def record(self, stage, seconds, span_tags=None, error=None):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = _Histogram()
+            histogram.observe(seconds, error is None)
+            if self._jsonl:
+                event = {'ts': round(time.time(), 3), 'stage': stage, 'ms': round(seconds * 1000, 1),
+                         **(span_tags or {})}
+                if error:
+                    event['error'] = error
+                self._jsonl.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+
+    def summary(self):
+        """{stage: {'count', 'errors', 'avg', 'max'}} in seconds."""
+        with self._lock:
+            return {
+                stage: {'count': h.count, 'errors': h.errors,
+                        'avg': round(h.sum / h.count, 3), 'max': round(h.max, 3)}
+                for stage, h in self._histograms.items()
+            }
+
+    def prometheus(self):
+        """All histograms in Prometheus text exposition format."""
+        lines = [
+            "# HELP nhl_stage_seconds Time spent per pipeline stage.",
+            "# TYPE nhl_stage_seconds histogram"
+        ]
+        errors = ["# HELP nhl_stage_errors_total Spans that ended with an exception.",
+                  "# TYPE nhl_stage_errors_total counter"]
+        with self._lock:
+            for stage, h in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS, h.counts):
+                    cumulative += count
+                    lines.append(f'nhl_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'nhl_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'nhl_stage_seconds_sum{{stage="{stage}"}} {h.sum:.6f}')
+                lines.append(f'nhl_stage_seconds_count{{stage="{stage}"}} {h.count}')
+                errors.append(f'nhl_stage_errors_total{{stage="{stage}"}} {h.errors}')
+        gauges = []
+        for prefix, read in sorted(self._gauges.items()):
+            try:
+                values = read()
+            except Exception as e:
+                logging.warning(f"Metrics gauges {prefix}: {e}")
+                continue
+            for name, value in sorted(values.items()):
+                if isinstance(value, (int, float)):
+                    metric = f"nhl_{prefix}_{name}"
+                    gauges.append(f"# TYPE {metric} {'counter' if name.endswith('_total') else 'gauge'}")
+                    gauges.append(f"{metric} {value}")
+        return "\n".join(lines + errors + gauges) + "\n"
+
+    def close(self):
+        self.enabled = False
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self._lock:
+            if self._jsonl:
+                self._jsonl.close()
+                self._jsonl = None
+
+
+def _handler(tracer):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = tracer.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # scrapes every few seconds would flood the bot log
+
+    return MetricsHandler
+
+
+# Process-wide tracer; bot.py enables it from the environment
+tracer = Tracer()
+
+
+def traced(stage):
+    """Decorator: times every call of the function as `stage`."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with _Span(tracer, stage, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate